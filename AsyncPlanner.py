@@ -0,0 +1,123 @@
+import asyncio
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import PathFinder
+import SearchBudget
+import level3
+import level4
+
+# Planning off the caller's thread.
+# Every plan runs in an executor and gives back a concurrent.futures.Future, which asyncio code can await
+# through wait(). Events (plan_id, kind, payload) with kind 'started', 'progress', 'done' or 'failed' are put
+# on the events queue, the Tk side reads them with Visualizer.watch_plan so the window never blocks.
+# Every task returns (path, budget), the budget carries the status and the best partial path.
+
+def plan_route(finder_name, maze, start, goal, time_limit, budget):
+    finder = getattr(PathFinder, finder_name)(maze)
+    finder.set_time_limit(time_limit)
+    finder.set_budget(budget)
+    return finder.find_path(start, goal), budget
+
+def plan_fuel_route(start, goal, time_limit, fuel_capacity, maze, budget):
+    return level3.a_star_fuel(start, goal, time_limit, fuel_capacity, maze, budget), budget
+
+def plan_agents(agents, maze, fuel_capacity, budget):
+    # Same steps as the level 4 UI, the agents are updated in place when running in a thread
+    path = level4.whca_star(agents, maze, fuel_capacity, budget=budget)
+    if path:
+        path = level4.get_agent_stop(path, agents, maze)
+        path = level4.generate_new_subagent_and_recreate_path(path, agents, maze, fuel_capacity, budget)
+    return path, budget
+
+class AsyncPlanner:
+    PROGRESS_INTERVAL = 0.05  # Seconds between two progress events of the same plan
+
+    def __init__(self, max_workers=2, processes=False):
+        # Processes avoid the GIL but can't report progress or be cancelled while running. Threads share the
+        # distance field and maze context caches, which take a lock around every lookup and edit
+        self.processes = processes
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='planner')
+        self.events = queue.Queue()
+        self.tokens = {}
+        self.next_id = 0
+
+    def submit(self, task, *args, time_limit=None, max_expansions=None):
+        plan_id = self.next_id
+        self.next_id += 1
+
+        if self.processes:
+            budget = SearchBudget.SearchBudget(time_limit, max_expansions)
+        else:
+            token = SearchBudget.CancellationToken()
+            self.tokens[plan_id] = token
+            budget = SearchBudget.SearchBudget(time_limit, max_expansions, token, self.progress_reporter(plan_id))
+
+        self.events.put((plan_id, 'started', None))
+        future = self.executor.submit(task, *args, budget)
+        future.add_done_callback(lambda future: self.on_done(plan_id, future))
+        return plan_id, future
+
+    def progress_reporter(self, plan_id):
+        last = 0
+        def report(expansions):
+            nonlocal last
+            now = time.perf_counter()
+            if now - last >= self.PROGRESS_INTERVAL:
+                last = now
+                self.events.put((plan_id, 'progress', expansions))
+        return report
+
+    def on_done(self, plan_id, future):
+        self.tokens.pop(plan_id, None)
+        if future.cancelled():
+            self.events.put((plan_id, 'failed', SearchBudget.CANCELLED))
+        elif future.exception() is not None:
+            self.events.put((plan_id, 'failed', future.exception()))
+        else:
+            self.events.put((plan_id, 'done', future.result()))
+
+    def cancel(self, plan_id, future=None):
+        if plan_id in self.tokens:
+            self.tokens[plan_id].cancel()
+        if future is not None:
+            future.cancel()
+
+    def route(self, finder_name, maze, start, goal, time_limit=0, **budget):
+        return self.submit(plan_route, finder_name, maze, start, goal, time_limit, **budget)
+
+    def fuel_route(self, start, goal, time_limit, fuel_capacity, maze, **budget):
+        return self.submit(plan_fuel_route, start, goal, time_limit, fuel_capacity, maze, **budget)
+
+    def agents(self, agents, maze, fuel_capacity, **budget):
+        return self.submit(plan_agents, agents, maze, fuel_capacity, **budget)
+
+    @staticmethod
+    async def wait(future):
+        return await asyncio.wrap_future(future)
+
+    async def route_async(self, *args, **kwargs):
+        return await self.wait(self.route(*args, **kwargs)[1])
+
+    async def fuel_route_async(self, *args, **kwargs):
+        return await self.wait(self.fuel_route(*args, **kwargs)[1])
+
+    async def agents_async(self, *args, **kwargs):
+        return await self.wait(self.agents(*args, **kwargs)[1])
+
+    def shutdown(self, wait=True):
+        for token in list(self.tokens.values()):
+            token.cancel()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+default_planner = None
+
+def get_default_planner():
+    global default_planner
+    if default_planner is None:
+        default_planner = AsyncPlanner()
+    return default_planner
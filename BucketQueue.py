@@ -0,0 +1,58 @@
+# Bucket queue (Dial's algorithm) shared by the searches.
+# Every cost in this project is a small integer (moves, toll waits, refuel times), so the frontier can be
+# a dictionary of buckets keyed by priority instead of a heap of tuples. Push and pop are O(1) apart from
+# walking the cursor over empty priorities, which only moves forward as long as priorities never decrease.
+# Inside a bucket the entries with the largest g are popped first, the usual A* tie-breaking that prefers
+# nodes closer to the goal. Costs are the same as with the heapq frontiers this replaced, but among paths of
+# equal cost a different one can come out (see EXPECTED_LEVEL3 in search_checks.py).
+class BucketQueue:
+    def __init__(self):
+        self.buckets = {}  # priority -> {g: [items]}
+        self.current = 0   # Lowest priority that may still hold items
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        # Every queued item, in no particular order
+        for bucket in self.buckets.values():
+            for items in bucket.values():
+                yield from items
+
+    def empty(self) -> bool:
+        return self.size == 0
+
+    def put(self, priority, item, g=0):
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            bucket = self.buckets[priority] = {}
+        items = bucket.get(g)
+        if items is None:
+            bucket[g] = [item]
+        else:
+            items.append(item)
+        # Priorities below the cursor only happen with inconsistent heuristics, move the cursor back for them
+        if self.size == 0 or priority < self.current:
+            self.current = priority
+        self.size += 1
+
+    def get(self):
+        return self.pop()[1]
+
+    def pop(self):
+        # Returns (priority, item)
+        if self.size == 0:
+            raise IndexError('pop from an empty BucketQueue')
+        while self.current not in self.buckets:
+            self.current += 1
+        bucket = self.buckets[self.current]
+        g = max(bucket)
+        items = bucket[g]
+        item = items.pop()
+        if not items:
+            del bucket[g]
+            if not bucket:
+                del self.buckets[self.current]
+        self.size -= 1
+        return self.current, item
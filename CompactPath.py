@@ -0,0 +1,282 @@
+import json
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+# Compact storage for long paths and level 4 plans.
+# A CompactPath keeps the start cell and runs of equal moves (direction code and run length) instead of one
+# tuple per cell. A CompactPlan keeps one agent index, action code, cell and direction code per step in flat
+# arrays, with the agent names and action names stored once. Both still behave like the lists they replace:
+# len(), iteration and indexing give the same (row, col) tuples and (name, pos, next_pos, action) steps.
+# Plans can be saved as binary (any file name) or as one JSON step per line (.jsonl), see save_plan and load_plan.
+
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0), (0, 0)]  # Right, down, left, up like the searches, then staying
+JUMP = len(DIRECTIONS)  # Plan steps that don't go to a neighbour, their next cell is kept in jumps
+ACTIONS = ['move', 'wait', 'refuel', 'toll', 'createnewgoal', 'refueling']
+
+def direction_code(before, after) -> int:
+    delta = (after[0] - before[0], after[1] - before[1])
+    return DIRECTIONS.index(delta) if delta in DIRECTIONS else JUMP
+
+def little_endian(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def read_array(typecode, data, offset, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    values.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+class CompactPath:
+    MAGIC = b'CPTH'
+
+    def __init__(self, start=None):
+        self.start = start
+        self.codes = array('B')  # Direction of every run
+        self.ends = array('I')   # Moves made up to the end of every run
+        self.rows = array('i')   # Cell every run starts from
+        self.cols = array('i')
+        self.last = start
+
+    @classmethod
+    def from_path(cls, path):
+        compact = cls(path[0] if path else None)
+        for cell in path[1:]:
+            compact.append(cell)
+        return compact
+
+    def append(self, cell):
+        if self.start is None:
+            self.start = self.last = cell
+            return
+        code = direction_code(self.last, cell)
+        if code == JUMP:
+            raise ValueError(f'{cell} is not next to {self.last}')
+        if self.codes and self.codes[-1] == code:
+            self.ends[-1] += 1
+        else:
+            self.codes.append(code)
+            self.ends.append((self.ends[-1] if self.ends else 0) + 1)
+            self.rows.append(self.last[0])
+            self.cols.append(self.last[1])
+        self.last = tuple(cell)
+
+    def __len__(self):
+        if self.start is None:
+            return 0
+        return (self.ends[-1] if self.ends else 0) + 1
+
+    def cell(self, index: int):
+        if index == 0:
+            return tuple(self.start)
+        run = bisect_left(self.ends, index)
+        steps = index - (self.ends[run - 1] if run else 0)
+        dx, dy = DIRECTIONS[self.codes[run]]
+        return (self.rows[run] + dx * steps, self.cols[run] + dy * steps)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.cell(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('path index out of range')
+        return self.cell(index)
+
+    def __iter__(self):
+        if self.start is None:
+            return
+        yield tuple(self.start)
+        for run, code in enumerate(self.codes):
+            dx, dy = DIRECTIONS[code]
+            x, y = self.rows[run], self.cols[run]
+            for _ in range(self.ends[run] - (self.ends[run - 1] if run else 0)):
+                x, y = x + dx, y + dy
+                yield (x, y)
+
+    def to_list(self) -> list:
+        return list(self)
+
+    def __eq__(self, other):
+        # Equal to anything holding the same items in the same order, a plain list included
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def to_bytes(self) -> bytes:
+        if self.start is None:
+            return self.MAGIC + struct.pack('<?', False)
+        header = self.MAGIC + struct.pack('<?iiI', True, self.start[0], self.start[1], len(self.codes))
+        return header + b''.join(little_endian(values) for values in [self.codes, self.ends, self.rows, self.cols])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CompactPath':
+        if data[:4] != cls.MAGIC:
+            raise ValueError('not a saved path')
+        if not struct.unpack_from('<?', data, 4)[0]:
+            return cls()
+        _, x, y, runs = struct.unpack_from('<?iiI', data, 4)
+        compact = cls((x, y))
+        offset = 4 + struct.calcsize('<?iiI')
+        compact.codes, offset = read_array('B', data, offset, runs)
+        compact.ends, offset = read_array('I', data, offset, runs)
+        compact.rows, offset = read_array('i', data, offset, runs)
+        compact.cols, offset = read_array('i', data, offset, runs)
+        if runs:
+            compact.last = compact.cell(len(compact) - 1)
+        return compact
+
+class CompactPlan:
+    MAGIC = b'CPLN'
+
+    def __init__(self, cols: int):
+        # cols is the width of the map, cells are kept as row * cols + col
+        self.width = cols
+        self.names = []
+        self.actions = list(ACTIONS)
+        self.name_codes = {}
+        self.action_codes = {action: code for code, action in enumerate(self.actions)}
+        self.agents = array('H')      # Agent of every step
+        self.codes = array('B')       # Action of every step
+        self.cells = array('I')       # Cell the step starts from
+        self.directions = array('B')  # Move of every step, JUMP when the next cell is in jumps
+        self.jumps = {}               # step -> next cell, for 'createnewgoal' and anything else not a move
+
+    @classmethod
+    def from_steps(cls, plan, cols: int = None) -> 'CompactPlan':
+        plan = list(plan)
+        if cols is None:
+            cols = max([max(pos[1], next_pos[1]) for _, pos, next_pos, _ in plan], default=0) + 1
+        compact = cls(cols)
+        for step in plan:
+            compact.append(step)
+        return compact
+
+    @staticmethod
+    def code(table, codes, value) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def append(self, step):
+        name, pos, next_pos, action = step
+        self.agents.append(self.code(self.names, self.name_codes, name))
+        self.codes.append(self.code(self.actions, self.action_codes, action))
+        self.cells.append(pos[0] * self.width + pos[1])
+        direction = direction_code(pos, next_pos)
+        self.directions.append(direction)
+        if direction == JUMP:
+            self.jumps[len(self.directions) - 1] = next_pos[0] * self.width + next_pos[1]
+
+    def extend(self, steps):
+        for step in steps:
+            self.append(step)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def step(self, index: int):
+        pos = divmod(self.cells[index], self.width)
+        direction = self.directions[index]
+        if direction == JUMP:
+            next_pos = divmod(self.jumps[index], self.width)
+        else:
+            next_pos = (pos[0] + DIRECTIONS[direction][0], pos[1] + DIRECTIONS[direction][1])
+        return (self.names[self.agents[index]], pos, next_pos, self.actions[self.codes[index]])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.step(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('plan index out of range')
+        return self.step(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.step(index)
+
+    def to_list(self) -> list:
+        return list(self)
+
+    def __eq__(self, other):
+        # Equal to anything holding the same items in the same order, a plain list included
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def to_bytes(self) -> bytes:
+        names = '\n'.join(self.names).encode()
+        actions = '\n'.join(self.actions).encode()
+        jumps = array('I')
+        for index, cell in self.jumps.items():
+            jumps.extend((index, cell))
+        header = self.MAGIC + struct.pack('<IIIII', self.width, len(names), len(actions), len(self), len(self.jumps))
+        return header + names + actions + b''.join(little_endian(values) for values in
+                                                   [self.agents, self.codes, self.cells, self.directions, jumps])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CompactPlan':
+        if data[:4] != cls.MAGIC:
+            raise ValueError('not a saved plan')
+        width, names_size, actions_size, steps, jumps = struct.unpack_from('<IIIII', data, 4)
+        offset = 4 + struct.calcsize('<IIIII')
+        compact = cls(width)
+        names = data[offset:offset + names_size].decode()
+        offset += names_size
+        compact.actions = data[offset:offset + actions_size].decode().split('\n')
+        offset += actions_size
+        compact.names = names.split('\n') if names else []
+        compact.name_codes = {name: code for code, name in enumerate(compact.names)}
+        compact.action_codes = {action: code for code, action in enumerate(compact.actions)}
+        compact.agents, offset = read_array('H', data, offset, steps)
+        compact.codes, offset = read_array('B', data, offset, steps)
+        compact.cells, offset = read_array('I', data, offset, steps)
+        compact.directions, offset = read_array('B', data, offset, steps)
+        pairs, offset = read_array('I', data, offset, 2 * jumps)
+        compact.jumps = dict(zip(pairs[::2], pairs[1::2]))
+        return compact
+
+    def to_jsonl(self):
+        # One line per step: ["S", [0, 0], [0, 1], "move"]
+        for name, pos, next_pos, action in self:
+            yield json.dumps([name, list(pos), list(next_pos), action])
+
+    @classmethod
+    def from_jsonl(cls, lines, cols: int = None) -> 'CompactPlan':
+        steps = []
+        for line in lines:
+            if line.strip():
+                name, pos, next_pos, action = json.loads(line)
+                steps.append((name, tuple(pos), tuple(next_pos), action))
+        return cls.from_steps(steps, cols)
+
+def save_plan(plan, file_path):
+    # A .jsonl file gets one JSON step per line, any other name the binary format
+    if not isinstance(plan, CompactPlan):
+        plan = CompactPlan.from_steps(plan)
+    if file_path.endswith('.jsonl'):
+        with open(file_path, 'w') as file:
+            for line in plan.to_jsonl():
+                file.write(line + '\n')
+    else:
+        with open(file_path, 'wb') as file:
+            file.write(plan.to_bytes())
+
+def load_plan(file_path) -> CompactPlan:
+    if file_path.endswith('.jsonl'):
+        with open(file_path) as file:
+            return CompactPlan.from_jsonl(file)
+    with open(file_path, 'rb') as file:
+        return CompactPlan.from_bytes(file.read())
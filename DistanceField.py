@@ -0,0 +1,146 @@
+import threading
+from collections import OrderedDict
+
+import MazeContext
+from BucketQueue import BucketQueue
+
+# True travel times to one goal cell, used as a heuristic that knows about walls, tolls and refuel stops.
+# The field is a reverse Dijkstra from the goal: distance[cell] is the cheapest time to walk from cell to
+# the goal when entering a cell costs enter_cost(cell, maze). Fuel and other agents are ignored, so the
+# values never overestimate and stay consistent for A*.
+class DistanceField:
+    UNREACHABLE = float('inf')
+
+    def __init__(self, maze: list, goal, enter_cost):
+        self.goal = goal
+        self.rows = len(maze)
+        self.cols = len(maze[0])
+        self.distance = [self.UNREACHABLE] * (self.rows * self.cols)
+        self.build(maze, enter_cost)
+
+    def build(self, maze, enter_cost):
+        gx, gy = self.goal
+        self.distance[gx * self.cols + gy] = 0
+        frontier = BucketQueue()
+        frontier.put(0, self.goal)
+        self.spread(maze, enter_cost, frontier)
+
+    def spread(self, maze, enter_cost, frontier):
+        while not frontier.empty():
+            cost, (x, y) = frontier.pop()
+            if cost > self.distance[x * self.cols + y]:
+                continue  # Stale entry
+            # Every neighbour reaches the goal through this cell by paying to enter it
+            new_cost = cost + enter_cost((x, y), maze)
+            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.rows and 0 <= ny < self.cols and maze[nx][ny] != -1:
+                    if new_cost < self.distance[nx * self.cols + ny]:
+                        self.distance[nx * self.cols + ny] = new_cost
+                        frontier.put(new_cost, (nx, ny))
+
+    def neighbors(self, cell, maze):
+        x, y = cell
+        for nx, ny in [(x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)]:
+            if 0 <= nx < self.rows and 0 <= ny < self.cols and maze[nx][ny] != -1:
+                yield (nx, ny)
+
+    def update(self, maze, cell, old_cost, new_cost, enter_cost) -> bool:
+        """Patch the field after the cell's entry cost went from old_cost to new_cost (None for a wall), the maze
+        already holds the new value. False when the field can't be patched and has to be built again."""
+        x, y = cell
+        index = x * self.cols + y
+        if new_cost is None or (old_cost is not None and new_cost > old_cost):
+            # Dearer or closed: fine as long as no neighbour takes its cheapest way through this cell
+            if cell == self.goal:
+                return False
+            if self.reachable(cell) and any(self[next] == self.distance[index] + old_cost for next in self.neighbors(cell, maze)):
+                return False
+            if new_cost is None:
+                self.distance[index] = self.UNREACHABLE
+            return True
+
+        # Cheaper or opened: only distances that now go through this cell drop, spread them from here
+        if old_cost is None and cell != self.goal:
+            self.distance[index] = min([enter_cost(next, maze) + self[next] for next in self.neighbors(cell, maze)] + [self.UNREACHABLE])
+        if self.reachable(cell):
+            frontier = BucketQueue()
+            frontier.put(self.distance[index], cell)
+            self.spread(maze, enter_cost, frontier)
+        return True
+
+    def __getitem__(self, cell):
+        return self.distance[cell[0] * self.cols + cell[1]]
+
+    def reachable(self, cell) -> bool:
+        return self[cell] != self.UNREACHABLE
+
+def fuel_to_enter(cell, maze) -> int:
+    # Stepping into a gas station refills the tank, so it needs no fuel left
+    return 0 if maze[cell[0]][cell[1]] <= -2 else 1
+
+# Least fuel an agent needs on every cell to make it to the goal or to a gas station, where the tank is
+# refilled. A state holding less fuel than fuel_needed[cell] can never reach the goal.
+class FuelField(DistanceField):
+    def __init__(self, maze: list, goal):
+        super().__init__(maze, goal, fuel_to_enter)
+
+    def build(self, maze, enter_cost):
+        frontier = BucketQueue()
+        for x, y in [self.goal] + sorted(MazeContext.of(maze).stations):
+            self.distance[x * self.cols + y] = 0
+            frontier.put(0, (x, y))
+        self.spread(maze, enter_cost, frontier)
+
+# Bounded least-recently-used cache of fields, so every agent and replan heading to the same goal shares one
+class DistanceFieldCache:
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.fields = OrderedDict()  # (id(maze), goal, enter_cost) -> (maze, field, version of the maze)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()  # Planner and server threads share the cache
+
+    def get(self, maze: list, goal, enter_cost) -> DistanceField:
+        key = (id(maze), goal, enter_cost)
+        with self.lock:
+            entry = self.fields.get(key)
+            # The maze is kept with the field, a new list that happens to reuse the id is not a hit. Neither is
+            # a Grid written to since the field was built without going through edit(), as in MazeContext.of
+            version = getattr(maze, 'version', None)
+            if entry is not None and entry[0] is maze and entry[2] == version:
+                self.fields.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            field = DistanceField(maze, goal, enter_cost)
+            self.fields[key] = (maze, field, version)
+            self.fields.move_to_end(key)
+            while len(self.fields) > self.max_size:
+                self.fields.popitem(last=False)
+            return field
+
+    def edit(self, maze: list, cell, value):
+        # Write value into the maze and patch or drop the fields built on it, returns how many were dropped
+        with self.lock:
+            entries = [(key, entry) for key, entry in self.fields.items() if entry[0] is maze]
+            x, y = cell
+            old_costs = [None if maze[x][y] == -1 else key[2](cell, maze) for key, _ in entries]
+            version = getattr(maze, 'version', None)
+            maze[x][y] = value
+            dropped = 0
+            for (key, (_, field, field_version)), old_cost in zip(entries, old_costs):
+                new_cost = None if value == -1 else key[2](cell, maze)
+                # A field already behind the maze can't be patched up to date with this one cell
+                if field_version != version or not field.update(maze, cell, old_cost, new_cost, key[2]):
+                    del self.fields[key]
+                    dropped += 1
+                else:
+                    self.fields[key] = (maze, field, getattr(maze, 'version', None))
+            return dropped
+
+    def clear(self):
+        with self.lock:
+            self.fields.clear()
+
+field_cache = DistanceFieldCache()
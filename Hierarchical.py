@@ -0,0 +1,250 @@
+from typing import List, Tuple, Optional
+
+import SearchBudget
+import DistanceField
+import MazeContext
+import level3
+from BucketQueue import BucketQueue
+from PathFinder import PathFinder
+
+# Hierarchical path finding (HPA*) for large maps.
+# The grid is cut into square clusters. Where two clusters touch, every run of open cells along their border
+# gets one or two entrances, a pair of cells facing each other. Inside a cluster the cheapest times between
+# its entrance cells are precomputed (tolls and refuel stops included), which gives a small abstract graph.
+# A query connects start and goal to the entrances of their clusters, searches the abstract graph and turns
+# each abstract edge back into cells only when the path is read.
+# Cluster costs are built the first time a search needs them, and update_cell only rebuilds the clusters
+# whose cells or borders changed.
+
+class HierarchicalMap:
+    LONG_ENTRANCE = 6  # Border runs at least this long get an entrance at both ends instead of the middle
+
+    def __init__(self, maze: list, cluster_size: int = 16, enter_cost=level3.enter_time):
+        self.maze = maze
+        self.rows = len(maze)
+        self.cols = len(maze[0])
+        self.cluster_size = cluster_size
+        self.enter_cost = enter_cost
+        self.cluster_rows = (self.rows + cluster_size - 1) // cluster_size
+        self.cluster_cols = (self.cols + cluster_size - 1) // cluster_size
+        self.borders = {}   # (cluster, cluster) -> [(cell, cell)] entrance pairs
+        self.inter = {}     # entrance cell -> {entrance cell across the border: cost}
+        self.intra = {}     # cluster -> {entrance cell: {entrance cell: cost}}, filled lazily
+        self.segments = {}  # (cell, cell) -> refined cells of an intra-cluster edge
+        for cluster in self.clusters():
+            x, y = cluster
+            if x + 1 < self.cluster_rows:
+                self.build_border(cluster, (x + 1, y))
+            if y + 1 < self.cluster_cols:
+                self.build_border(cluster, (x, y + 1))
+
+    def clusters(self):
+        for x in range(self.cluster_rows):
+            for y in range(self.cluster_cols):
+                yield (x, y)
+
+    def cluster_of(self, cell):
+        return (cell[0] // self.cluster_size, cell[1] // self.cluster_size)
+
+    def bounds(self, cluster):
+        # Row and column ranges of the cluster, upper ends excluded
+        x, y = cluster
+        size = self.cluster_size
+        return x * size, min((x + 1) * size, self.rows), y * size, min((y + 1) * size, self.cols)
+
+    def is_open(self, cell) -> bool:
+        return self.maze[cell[0]][cell[1]] != -1
+
+    def build_border(self, first, second):
+        # first is above or left of second
+        for a, b in self.borders.pop((first, second), []):
+            for cell, other in [(a, b), (b, a)]:
+                self.inter[cell].pop(other, None)
+                if not self.inter[cell]:
+                    del self.inter[cell]
+
+        top, bottom, left, right = self.bounds(first)
+        if second[0] > first[0]:
+            pairs = [((bottom - 1, y), (bottom, y)) for y in range(left, right)]
+        else:
+            pairs = [((x, right - 1), (x, right)) for x in range(top, bottom)]
+
+        entrances = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and self.is_open(pair[0]) and self.is_open(pair[1]):
+                run.append(pair)
+                continue
+            if len(run) >= self.LONG_ENTRANCE:
+                entrances += [run[0], run[-1]]
+            elif run:
+                entrances.append(run[len(run) // 2])
+            run = []
+
+        self.borders[(first, second)] = entrances
+        for a, b in entrances:
+            self.inter.setdefault(a, {})[b] = self.enter_cost(b, self.maze)
+            self.inter.setdefault(b, {})[a] = self.enter_cost(a, self.maze)
+
+    def entrances(self, cluster):
+        x, y = cluster
+        cells = set()
+        for first, second in [((x - 1, y), cluster), ((x, y - 1), cluster), (cluster, (x + 1, y)), (cluster, (x, y + 1))]:
+            for a, b in self.borders.get((first, second), []):
+                cells.add(a if first == cluster else b)
+        return cells
+
+    def local_costs(self, source, cluster, reverse=False):
+        # Dijkstra inside one cluster. Forward gives the time from source to every cell, reverse the time
+        # from every cell to source. Also returns the parents for turning the result into cells.
+        top, bottom, left, right = self.bounds(cluster)
+        cost = {source: 0}
+        parents = {source: None}
+        frontier = BucketQueue()
+        frontier.put(0, source)
+        while not frontier.empty():
+            current_cost, (x, y) = frontier.pop()
+            if current_cost > cost[(x, y)]:
+                continue  # Stale entry
+            for nx, ny in [(x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)]:
+                if top <= nx < bottom and left <= ny < right and self.maze[nx][ny] != -1:
+                    step = self.enter_cost((x, y) if reverse else (nx, ny), self.maze)
+                    if current_cost + step < cost.get((nx, ny), float('inf')):
+                        cost[(nx, ny)] = current_cost + step
+                        parents[(nx, ny)] = (x, y)
+                        frontier.put(current_cost + step, (nx, ny))
+        return cost, parents
+
+    def cluster_edges(self, cluster):
+        edges = self.intra.get(cluster)
+        if edges is None:
+            edges = self.intra[cluster] = {}
+            entrances = self.entrances(cluster)
+            for entrance in entrances:
+                cost, _ = self.local_costs(entrance, cluster)
+                edges[entrance] = {other: cost[other] for other in entrances if other != entrance and other in cost}
+        return edges
+
+    def neighbors(self, cell):
+        yield from self.cluster_edges(self.cluster_of(cell)).get(cell, {}).items()
+        yield from self.inter.get(cell, {}).items()
+
+    def build(self):
+        # Precompute every cluster instead of on first use
+        for cluster in self.clusters():
+            self.cluster_edges(cluster)
+
+    def abstract_path(self, start, goal, budget: SearchBudget.SearchBudget = None):
+        """Cheapest path on the abstract graph as (cells, cost). The cells are start, the entrances passed and
+        goal, consecutive cells in the same cluster are joined by refine(). None when goal can't be reached."""
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+        if not (self.is_open(start) and self.is_open(goal)):
+            return None
+        from_start, _ = self.local_costs(start, start_cluster)
+        to_goal, _ = self.local_costs(goal, goal_cluster, reverse=True)
+        start_edges = {cell: from_start[cell] for cell in self.entrances(start_cluster) if cell in from_start}
+        if start_cluster == goal_cluster and goal in from_start:
+            start_edges[goal] = from_start[goal]
+        goal_edges = {cell: to_goal[cell] for cell in self.entrances(goal_cluster) if cell in to_goal}
+
+        frontier = BucketQueue()
+        frontier.put(PathFinder.heuristic(start, goal), start)
+        cost = {start: 0}
+        came_from = {start: None}
+        closed = set()
+        while not frontier.empty():
+            current = frontier.get()
+            if current in closed:
+                continue  # Stale entry
+            closed.add(current)
+            if current == goal:
+                return PathFinder.reconstruct_path(came_from, start, goal), cost[goal]
+            if budget is not None and not budget.expand():
+                return None
+            if current == start:
+                edges = list(start_edges.items()) + list(self.inter.get(start, {}).items())
+            else:
+                edges = list(self.neighbors(current))
+                if current in goal_edges:
+                    edges.append((goal, goal_edges[current]))
+            for next, step in edges:
+                new_cost = cost[current] + step
+                if new_cost < cost.get(next, float('inf')):
+                    cost[next] = new_cost
+                    came_from[next] = current
+                    frontier.put(new_cost + PathFinder.heuristic(next, goal), next, new_cost)
+        return None
+
+    def refine(self, abstract: List[Tuple[int, int]]):
+        # Cells of the path, one abstract edge at a time so a caller can stop early
+        yield abstract[0]
+        for a, b in zip(abstract, abstract[1:]):
+            if b in self.inter.get(a, {}) and self.cluster_of(a) != self.cluster_of(b):
+                yield b
+                continue
+            segment = self.segments.get((a, b))
+            if segment is None:
+                _, parents = self.local_costs(a, self.cluster_of(a))
+                segment = PathFinder.reconstruct_path(parents, a, b)
+                # Start and goal change with every query, only edges between entrances are kept
+                if a in self.inter and b in self.inter:
+                    self.segments[(a, b)] = segment
+            yield from segment[1:]
+
+    def find_path(self, start, goal, budget: SearchBudget.SearchBudget = None) -> Optional[List[Tuple[int, int]]]:
+        result = self.abstract_path(start, goal, budget)
+        if result is None:
+            return None
+        return list(self.refine(result[0]))
+
+    def update_cell(self, cell, value):
+        # Change one cell of the maze, only its cluster and the clusters across a border it sits on are rebuilt
+        x, y = cell
+        DistanceField.field_cache.edit(self.maze, cell, value)  # Writes the value and patches the cached fields
+        MazeContext.edited(self.maze, cell)
+        cluster = self.cluster_of(cell)
+        top, bottom, left, right = self.bounds(cluster)
+        borders = []
+        if x == top and cluster[0] > 0:
+            borders.append(((cluster[0] - 1, cluster[1]), cluster))
+        if x == bottom - 1 and cluster[0] + 1 < self.cluster_rows:
+            borders.append((cluster, (cluster[0] + 1, cluster[1])))
+        if y == left and cluster[1] > 0:
+            borders.append(((cluster[0], cluster[1] - 1), cluster))
+        if y == right - 1 and cluster[1] + 1 < self.cluster_cols:
+            borders.append((cluster, (cluster[0], cluster[1] + 1)))
+
+        touched = {cluster}
+        for first, second in borders:
+            self.build_border(first, second)
+            touched.update((first, second))
+        for changed in touched:
+            self.intra.pop(changed, None)
+        self.segments = {key: segment for key, segment in self.segments.items() if self.cluster_of(key[0]) not in touched}
+        return touched
+
+class HierarchicalPathFinder(PathFinder):
+    cluster_size = 16
+
+    def __init__(self, maze: list, visualizer: 'Visualizer.Visualizer' = None):
+        super().__init__(maze, visualizer)
+        self.hierarchy = None
+
+    def find_path(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        if self.hierarchy is None:
+            self.hierarchy = HierarchicalMap(self.maze, self.cluster_size)
+        result = self.hierarchy.abstract_path(start, goal, self.budget)
+        if result is None:
+            if self.budget is not None and self.budget.stopped():
+                return self.end_search(self.budget.status)
+            self.visualize_step(headline='HPA* Search', lvl_name='Level 2: Time limitation', result=('No path found :<', 'red'))
+            return self.end_search(SearchBudget.INFEASIBLE)
+
+        abstract, cost = result
+        if self.time_limit and cost > self.time_limit:
+            self.visualize_step(headline='HPA* Search', lvl_name='Level 2: Time limitation', result=('No path found :<', 'red'))
+            return self.end_search(SearchBudget.INFEASIBLE)
+        path = list(self.hierarchy.refine(abstract))
+        self.visualize_step(headline='HPA* Search', lvl_name='Level 2: Time limitation', result=('Success. Total time: ' + str(cost), 'green'))
+        return self.end_search(SearchBudget.SOLVED, path)
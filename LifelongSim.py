@@ -0,0 +1,130 @@
+import random
+import sys
+import time
+
+import CompactPath
+import MazeContext
+import ReadInput
+import SearchBudget
+import level4
+
+# Level 4's lifelong deliveries without the UI: every agent that reaches its goal gets a new one and the fleet
+# is planned again with whca_star, as generate_new_subagent_and_recreate_path does. Goals come from a seeded
+# random.Random over the map's free cells, so a run can be repeated exactly.
+# One tick is one step of every agent's plan, the same time step the validator and the UI use. The executed
+# steps, 'createnewgoal' entries included, are kept in FleetStats.plan as a CompactPlan.
+
+class FleetStats:
+    def __init__(self, cols: int):
+        self.deliveries = []     # Goals reached, per tick
+        self.planning_time = []  # Seconds spent planning, per tick
+        self.replans = 0
+        self.failures = 0        # Replans that found no plan for the fleet
+        self.plan = CompactPath.CompactPlan(cols)
+
+    @property
+    def ticks(self) -> int:
+        return len(self.deliveries)
+
+    def throughput(self) -> float:
+        # Deliveries per tick
+        return sum(self.deliveries) / self.ticks if self.ticks else 0
+
+    def summary(self) -> dict:
+        return {'ticks': self.ticks, 'deliveries': sum(self.deliveries), 'throughput': self.throughput(),
+                'replans': self.replans, 'failures': self.failures, 'planning_seconds': sum(self.planning_time),
+                'max_planning_seconds': max(self.planning_time, default=0)}
+
+def new_goal(position, rng, free_cells):
+    # Never the cell the agent stands on, unless it is the only free one
+    goal = level4.generate_new_position(None, rng, free_cells)
+    while goal == position and len(free_cells) > 1:
+        goal = level4.generate_new_position(None, rng, free_cells)
+    return goal
+
+def simulate(maze, starts, fuel_capacity, ticks, num_agents=None, seed=0, window_size=5, low_level=None,
+             max_expansions=100000, carry_fuel=False) -> FleetStats:
+    """Run num_agents agents (as many as starts by default) for ticks ticks. The first agents start on starts,
+    the others on random free cells, ValueError when there are fewer free cells than agents. A replan expanding
+    more than max_expansions states counts as failed, a goal out of fuel range would otherwise keep whca_star
+    waiting forever.
+    Like the UI, every replan starts the agents with a full tank. With carry_fuel they keep what is left, agents
+    far from a gas station then get stranded and every later replan fails."""
+    rng = random.Random(seed)
+    free_cells = MazeContext.of(maze).free_cells()
+    num_agents = len(starts) if num_agents is None else num_agents
+    if num_agents > len(free_cells):
+        raise ValueError(f"{num_agents} agents don't fit on the {len(free_cells)} free cells of the map")
+    positions = list(starts[:num_agents])
+    taken = set(positions)
+    while len(positions) < num_agents:
+        cell = rng.choice(free_cells)
+        if cell not in taken:
+            positions.append(cell)
+            taken.add(cell)
+
+    agents = [level4.Agent(position, new_goal(position, rng, free_cells), fuel_capacity, ticks, is_main=index == 0,
+                           name='S' if index == 0 else f'S{index}')
+              for index, position in enumerate(positions)]
+    fuel = {agent.name: fuel_capacity for agent in agents}
+    steps = {agent.name: [] for agent in agents}  # Steps of the current plan not taken yet, reversed
+    stats = FleetStats(len(maze[0]))
+    replan = True
+
+    for _ in range(ticks):
+        planning_time = 0.0
+        delivered = 0
+        if replan:
+            for agent in agents:
+                agent.fuel = fuel[agent.name] if carry_fuel else fuel_capacity
+            started = time.perf_counter()
+            merged = level4.whca_star(agents, maze, fuel_capacity, window_size, SearchBudget.SearchBudget(max_expansions=max_expansions), low_level)
+            planning_time = time.perf_counter() - started
+            stats.replans += 1
+            if merged is None:
+                # Someone's goal can't be reached from where it stands, every agent gets a new one
+                stats.failures += 1
+                for agent in agents:
+                    agent.goal = new_goal(agent.start, rng, free_cells)
+                stats.deliveries.append(0)
+                stats.planning_time.append(planning_time)
+                continue
+            for steps_left in steps.values():
+                steps_left.clear()
+            for step in reversed(merged):
+                steps[step[0]].append(step)
+            replan = False
+
+        for agent in agents:
+            steps_left = steps[agent.name]
+            if not steps_left:
+                continue
+            step = steps_left.pop()
+            stats.plan.append(step)
+            _, position, next_position, _ = step
+            if level4.is_gas_station(next_position, maze):
+                fuel[agent.name] = fuel_capacity
+            elif next_position != position:
+                fuel[agent.name] -= 1
+            agent.start = next_position
+            if next_position == agent.goal:
+                delivered += 1
+                agent.goal = new_goal(next_position, rng, free_cells)
+                stats.plan.append((agent.name, next_position, agent.goal, 'createnewgoal'))
+                replan = True
+        if not any(steps.values()):
+            replan = True  # Every plan ran out, nobody is moving any more
+
+        stats.deliveries.append(delivered)
+        stats.planning_time.append(planning_time)
+    return stats
+
+if __name__ == '__main__':
+    # python LifelongSim.py input1_level4.txt [agents] [ticks] [seed]
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'input1_level4.txt'
+    n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+    num_agents = int(sys.argv[2]) if len(sys.argv) > 2 else len(starts)
+    ticks = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    for key, value in simulate(maze, starts, fuel_capacity, ticks, num_agents, seed).summary().items():
+        print(f'{key}: {value}')
@@ -0,0 +1,85 @@
+import DistanceField
+import MazeContext
+
+# A maze that changes while the app runs: roads close, tolls change, stations open or close.
+# Edits are written into the same list of lists ReadInput returned, so every solver holding it sees them.
+# Every edit bumps the version and keeps the maze's MazeContext up to date. Cached distance fields are patched
+# in place and only dropped when the edit changes them in a way that can't be patched. Other precomputed data
+# subscribes with watch() and is told about edits inside its region only.
+
+WALL = -1
+
+def cell_value(token) -> int:
+    # Same encoding as ReadInput: '-1' is a wall, 'F2' becomes -3, a number is a toll wait
+    token = str(token)
+    if token.startswith('F'):
+        return -1 - int(token[1:])
+    return int(token)
+
+def cell_token(value: int) -> str:
+    return 'F' + str(-1 - value) if value < WALL else str(value)
+
+class LiveMap:
+    def __init__(self, maze: list, raw_maze: list = None, field_cache: DistanceField.DistanceFieldCache = None):
+        self.maze = maze
+        self.raw_maze = raw_maze  # Kept in sync for the Visualizer when given
+        self.field_cache = field_cache if field_cache is not None else DistanceField.field_cache
+        self.version = 0
+        self.edited = {}    # cell -> version of its last edit
+        self.watchers = []  # (callback, region)
+        self.dropped_fields = 0
+
+    def watch(self, callback, region=None):
+        """callback(cell, old_value, new_value) runs after every edit inside region, a (top, bottom, left, right)
+        box with the upper ends excluded, or after every edit when region is None."""
+        self.watchers.append((callback, region))
+        return callback
+
+    def unwatch(self, callback):
+        self.watchers = [(watcher, region) for watcher, region in self.watchers if watcher is not callback]
+
+    @staticmethod
+    def in_region(cell, region) -> bool:
+        if region is None:
+            return True
+        top, bottom, left, right = region
+        return top <= cell[0] < bottom and left <= cell[1] < right
+
+    def set_cell(self, cell, value) -> int:
+        # value is a number in ReadInput's encoding or a token from the input file ('-1', '3', 'F2')
+        value = cell_value(value)
+        x, y = cell
+        old_value = self.maze[x][y]
+        if old_value == value:
+            return self.version
+
+        self.dropped_fields += self.field_cache.edit(self.maze, cell, value)
+        MazeContext.edited(self.maze, cell)
+        if self.raw_maze is not None and (value == WALL or self.raw_maze[x][y][0] not in 'SG'):
+            self.raw_maze[x][y] = cell_token(value)
+        self.version += 1
+        self.edited[cell] = self.version
+        for callback, region in list(self.watchers):
+            if self.in_region(cell, region):
+                callback(cell, old_value, value)
+        return self.version
+
+    def close_road(self, cell) -> int:
+        return self.set_cell(cell, WALL)
+
+    def set_toll(self, cell, wait: int) -> int:
+        return self.set_cell(cell, wait)
+
+    def set_station(self, cell, number: int = 1) -> int:
+        # Same as an F<number> cell in the input file
+        return self.set_cell(cell, 'F' + str(number))
+
+    def apply(self, edits) -> int:
+        # Several (cell, value) edits, returns the version after the last one
+        for cell, value in edits:
+            self.set_cell(cell, value)
+        return self.version
+
+    def changed_since(self, version: int, region=None) -> bool:
+        # Whether a cell inside region was edited after version, for data that checks instead of watching
+        return any(edit_version > version and self.in_region(cell, region) for cell, edit_version in self.edited.items())
@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import OrderedDict
+
+import ReadInput
+
+# Everything the solvers look up about a map, worked out once per cell.
+# A MazeContext holds the parsed input file, the wall, toll and gas station cells, the open neighbours of
+# every cell (in the order the searches always used: right, down, left, up) and per-cell move times.
+# Nothing is worked out up front: neighbours and move times are filled in for a cell the first time a search
+# asks for it, and wall, toll and station lookups read the cell's value, so a short search on a big map only
+# pays for the cells it visits.
+# load() reuses the context of a file until the file changes on disk, of() finds or builds the context of a
+# maze list, so the solvers can keep taking the plain maze as before.
+# Mazes from load() are Grids, lists whose rows count every write. A context remembers the count it is up to
+# date with, of() builds it again when the maze was written to without edited(), and load() starts again
+# from the file's contents once its maze has been edited, so an edit never leaks into a later load.
+
+class Grid(list):
+    def __init__(self, rows):
+        super().__init__(Row(row, self) for row in rows)
+        self.version = 0  # Writes to any cell so far
+
+    def __setitem__(self, index, rows):
+        rows = [Row(row, self) for row in rows] if isinstance(index, slice) else Row(rows, self)
+        super().__setitem__(index, rows)
+        self.version += 1
+
+class Row(list):
+    def __init__(self, values, grid: Grid):
+        super().__init__(values)
+        self.grid = grid
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self.grid.version += 1
+
+class CellTable(dict):
+    # cell -> value(cell), worked out on first lookup
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+    def __missing__(self, cell):
+        value = self[cell] = self.value(cell)
+        return value
+
+class CellKind:
+    # The cells whose value belongs() accepts, read from the maze on each lookup. Iterating goes over the
+    # whole maze
+    def __init__(self, maze: list, belongs):
+        self.maze = maze
+        self.belongs = belongs
+
+    def __contains__(self, cell):
+        x, y = cell
+        return self.belongs(self.maze[x][y])
+
+    def __iter__(self):
+        for x, row in enumerate(self.maze):
+            for y, value in enumerate(row):
+                if self.belongs(value):
+                    yield (x, y)
+
+class MazeContext:
+    DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+    def __init__(self, maze: list, raw_maze: list = None, starts=(), goals=(), time_limit=0, fuel_capacity=0):
+        self.maze = maze
+        self.raw_maze = raw_maze
+        self.rows = len(maze)
+        self.cols = len(maze[0])
+        self.starts = list(starts)
+        self.goals = list(goals)
+        self.time_limit = time_limit
+        self.fuel_capacity = fuel_capacity
+        self.file_path = None
+        self.mtime = None
+        self.version = getattr(maze, 'version', None)  # Version of a Grid the context is up to date with
+        self.walls = CellKind(maze, lambda value: value == -1)
+        self.tolls = CellKind(maze, lambda value: value > 0)      # Cells with a wait
+        self.stations = CellKind(maze, lambda value: value <= -2)  # Gas stations
+        self.adjacency = CellTable(self.open_neighbors)  # cell -> open neighbours
+        self.time_tables = {}  # enter_cost -> {cell: enter_cost(cell, maze)}
+        self.open_cells = None  # Every cell that isn't a wall, row by row, built on first use
+
+    def open_neighbors(self, cell):
+        x, y = cell
+        neighbors = []
+        for dx, dy in self.DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.rows and 0 <= ny < self.cols and self.maze[nx][ny] != -1:
+                neighbors.append((nx, ny))
+        return neighbors
+
+    def time_table(self, enter_cost) -> dict:
+        # enter_cost(cell, maze) of the open cells, each worked out on first lookup
+        with lock:
+            table = self.time_tables.get(enter_cost)
+            if table is None:
+                table = self.time_tables[enter_cost] = CellTable(lambda cell: enter_cost(cell, self.maze))
+            return table
+
+    def free_cells(self) -> list:
+        # Don't change the returned list
+        with lock:
+            if self.open_cells is None:
+                self.open_cells = [(x, y) for x, row in enumerate(self.maze) for y, value in enumerate(row) if value != -1]
+            return self.open_cells
+
+    def read_input(self):
+        # Same values as ReadInput.read_input_file
+        return self.rows, self.cols, self.time_limit, self.fuel_capacity, self.raw_maze, self.maze, self.starts, self.goals
+
+    def update_cell(self, cell, old_value=None, new_value=None):
+        # The maze already holds the new value, forget what depends on this cell. Matches LiveMap.watch
+        with lock:
+            self.open_cells = None
+            x, y = cell
+            for neighbor in [cell] + [(x + dx, y + dy) for dx, dy in self.DIRECTIONS]:
+                self.adjacency.pop(neighbor, None)
+            for table in self.time_tables.values():
+                table.pop(cell, None)
+            self.version = getattr(self.maze, 'version', None)
+
+    def rebuilt(self) -> 'MazeContext':
+        # A new context of the same maze as it is now, with what the file said
+        context = MazeContext(self.maze, self.raw_maze, self.starts, self.goals, self.time_limit, self.fuel_capacity)
+        context.file_path = self.file_path
+        context.mtime = self.mtime
+        return context
+
+# Contexts of maze lists, oldest first. The maze is kept with its context, a new list reusing
+# the id of a dropped one is not a hit
+contexts = OrderedDict()  # id(maze) -> context
+MAX_CONTEXTS = 16
+files = {}  # file path -> (modification time, file contents as tuples, context)
+lock = threading.RLock()  # Planner and server threads share the contexts
+
+def remember(context: MazeContext):
+    with lock:
+        contexts[id(context.maze)] = context
+        contexts.move_to_end(id(context.maze))
+        while len(contexts) > MAX_CONTEXTS:
+            contexts.popitem(last=False)
+
+def of(maze: list) -> MazeContext:
+    context = contexts.get(id(maze))
+    if context is not None and context.maze is maze and context.version == getattr(maze, 'version', None):
+        return context
+    with lock:
+        context = contexts.get(id(maze))
+        if context is None or context.maze is not maze:
+            context = MazeContext(maze)
+            remember(context)
+        elif context.version != getattr(maze, 'version', None):
+            # Written to without edited()
+            context = context.rebuilt()
+            remember(context)
+        return context
+
+def edited(maze: list, cell):
+    # Tell the context of maze, if it has one, that cell was changed in place
+    with lock:
+        context = contexts.get(id(maze))
+        if context is not None and context.maze is maze:
+            context.update_cell(cell)
+
+def load(file_path) -> MazeContext:
+    # Parse the file the first time and again only once its modification time changes. The context, and the
+    # caches built on its maze, are shared until someone edits the maze
+    mtime = os.stat(file_path).st_mtime_ns
+    with lock:
+        entry = files.get(file_path)
+        if entry is None or entry[0] != mtime:
+            n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+            contents = (tuple(map(tuple, raw_maze)), tuple(map(tuple, maze)), tuple(starts), tuple(goals), time_limit, fuel_capacity)
+            entry = files[file_path] = (mtime, contents, None)
+        mtime, contents, context = entry
+        if context is None or context.maze.version != 0:
+            raw_maze, maze, starts, goals, time_limit, fuel_capacity = contents
+            context = MazeContext(Grid(maze), [list(row) for row in raw_maze], starts, goals, time_limit, fuel_capacity)
+            context.file_path = file_path
+            context.mtime = mtime
+            files[file_path] = (mtime, contents, context)
+        remember(context)
+        return context
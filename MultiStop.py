@@ -0,0 +1,188 @@
+import DistanceField
+import level3
+from BucketQueue import BucketQueue
+
+# Multi-stop delivery tours.
+# A courier leaves start, visits every delivery cell once and the legs are stitched into one cell path.
+# Travel times between all points come from one distance field per stop (level 3 time model: moves, toll
+# waits and refuel stops). The visiting order starts from nearest neighbour and is improved by 2-opt and
+# Or-opt. Time windows are (earliest, latest) arrival times per stop, arriving early means waiting.
+# With a fuel capacity the legs are stitched by one search that also tracks the fuel.
+
+def travel_time_matrix(maze, points):
+    # matrix[i][j] is the travel time from points[i] to points[j], one reverse search per point
+    fields = [DistanceField.field_cache.get(maze, point, level3.enter_time) for point in points]
+    return [[fields[j][points[i]] for j in range(len(points))] for i in range(len(points))]
+
+def schedule(order, matrix, time_windows=None):
+    # Arrival time at every stop of the order (indices into the matrix, 0 is the start)
+    # and the number of windows that are missed
+    arrivals = []
+    late = 0
+    current_time = 0
+    previous = 0
+    for stop in order:
+        current_time += matrix[previous][stop]
+        if time_windows is not None and time_windows[stop - 1] is not None:
+            earliest, latest = time_windows[stop - 1]
+            current_time = max(current_time, earliest)
+            if current_time > latest:
+                late += 1
+        arrivals.append(current_time)
+        previous = stop
+    return arrivals, late
+
+def tour_cost(order, matrix, time_windows=None):
+    arrivals, late = schedule(order, matrix, time_windows)
+    return late, arrivals[-1] if arrivals else 0
+
+def nearest_neighbour_order(matrix):
+    order = []
+    remaining = set(range(1, len(matrix)))
+    current = 0
+    while remaining:
+        current = min(remaining, key=lambda stop: (matrix[current][stop], stop))
+        order.append(current)
+        remaining.remove(current)
+    return order
+
+def two_opt(order, matrix, time_windows=None):
+    # Reverse segments of the tour as long as that makes it better
+    best = tour_cost(order, matrix, time_windows)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = tour_cost(candidate, matrix, time_windows)
+                if cost < best:
+                    order, best, improved = candidate, cost, True
+    return order
+
+def or_opt(order, matrix, time_windows=None, max_segment=3):
+    # Move runs of up to max_segment stops to another place in the tour
+    best = tour_cost(order, matrix, time_windows)
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            for i in range(len(order) - length + 1):
+                segment = order[i:i + length]
+                rest = order[:i] + order[i + length:]
+                for j in range(len(rest) + 1):
+                    if j == i:
+                        continue
+                    candidate = rest[:j] + segment + rest[j:]
+                    cost = tour_cost(candidate, matrix, time_windows)
+                    if cost < best:
+                        order, best, improved = candidate, cost, True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return order
+
+def order_stops(matrix, time_windows=None):
+    order = nearest_neighbour_order(matrix)
+    # Alternate both moves until neither finds anything better
+    while True:
+        cost = tour_cost(order, matrix, time_windows)
+        order = or_opt(two_opt(order, matrix, time_windows), matrix, time_windows)
+        if tour_cost(order, matrix, time_windows) >= cost:
+            return order
+
+def walk_field(maze, field, start):
+    # Follow a distance field downhill, gives a cheapest path from start to the field's goal
+    path = [start]
+    current = start
+    while current != field.goal:
+        current = min((next for next in level3.get_neighbors(current, maze)),
+                      key=lambda next: level3.enter_time(next, maze) + field[next])
+        path.append(current)
+    return path
+
+def stitch_with_fuel(maze, targets, time_limit, fuel_capacity, windows):
+    # Cheapest walk through targets in the given order (targets[0] is the start) under the level 3 fuel rules.
+    # One search over (cell, fuel, index of the next target) states, so the courier refuels legs ahead of
+    # where it runs dry. windows[k] is the window of targets[k + 1] or None. Returns (path, arrivals) or None.
+    if time_limit is None:
+        time_limit = float('inf')
+    start = (targets[0], fuel_capacity, 1)
+    frontier = BucketQueue()
+    frontier.put(0, start)
+    reached = {start: 0}
+    parents = {start: None}
+    while not frontier.empty():
+        current_time, state = frontier.pop()
+        if current_time > reached[state]:
+            continue  # Stale entry
+        cell, fuel, index = state
+        if index == len(targets):
+            break
+        for next, new_fuel, action in level3.get_neighbors_with_fuel(cell, fuel, fuel_capacity, maze):
+            new_time = current_time + level3.time_to_move(next, action, maze)
+            new_index = index
+            if next == targets[index]:
+                new_index += 1
+                if windows[index - 1] is not None:
+                    earliest, latest = windows[index - 1]
+                    new_time = max(new_time, earliest)  # Wait at the door
+                    if new_time > latest:
+                        continue
+            next_state = (next, new_fuel, new_index)
+            if new_fuel >= 0 and new_time <= time_limit and new_time < reached.get(next_state, float('inf')):
+                reached[next_state] = new_time
+                parents[next_state] = state
+                frontier.put(new_time, next_state)
+    else:
+        return None
+
+    path = []
+    arrivals = []
+    while state is not None:
+        parent = parents[state]
+        if parent is not None and parent[2] != state[2]:
+            arrivals.append(reached[state])
+        path.append(state[0])
+        state = parent
+    return path[::-1], arrivals[::-1]
+
+def moved_orders(order):
+    for i in range(len(order)):
+        rest = order[:i] + order[i + 1:]
+        for j in range(len(order)):
+            yield rest[:j] + [order[i]] + rest[j:]
+
+def plan_tour(maze, start, stops, time_limit=None, fuel_capacity=None, time_windows=None, max_retries=100):
+    """Returns (path, order, arrivals): the stitched cell path, the stops in visiting order and the arrival
+    time at each of them. None when a stop can't be reached or the tour breaks the time limit, the fuel
+    rules or a time window."""
+    if not stops:
+        return [start], [], []
+    points = [start] + list(stops)
+    matrix = travel_time_matrix(maze, points)
+    if any(matrix[0][j] == DistanceField.DistanceField.UNREACHABLE for j in range(1, len(points))):
+        return None
+
+    order = order_stops(matrix, time_windows)
+    arrivals, late = schedule(order, matrix, time_windows)
+    if late or (time_limit is not None and arrivals[-1] > time_limit):
+        return None  # Already too slow without fuel
+    if fuel_capacity is None:
+        path = [start]
+        for stop in order:
+            path.extend(walk_field(maze, DistanceField.field_cache.get(maze, points[stop], level3.enter_time), path[-1])[1:])
+        return path, [points[stop] for stop in order], arrivals
+
+    # The matrix knows nothing about fuel. When the courier runs dry on the best order, single stops are moved
+    # to other places, cheapest orders first, until one can be driven or max_retries is used up
+    candidates = [order] + sorted((moved for moved in moved_orders(order) if moved != order),
+                                  key=lambda moved: tour_cost(moved, matrix, time_windows))[:max_retries]
+    for candidate in candidates:
+        windows = [time_windows[stop - 1] if time_windows is not None else None for stop in candidate]
+        stitched = stitch_with_fuel(maze, [start] + [points[stop] for stop in candidate], time_limit, fuel_capacity, windows)
+        if stitched is not None:
+            return stitched[0], [points[stop] for stop in candidate], stitched[1]
+    return None
@@ -1,9 +1,15 @@
 import heapq
 import time
+from array import array
 from typing import List, Tuple, Dict, Set, Optional
 from abc import ABC, abstractmethod
 
-import Visualizer
+import SearchBudget
+import MazeContext
+import DistanceField
+from BucketQueue import BucketQueue
+
+# The solvers never import the GUI, a Visualizer is only handed in by the UI code
 
 class PriorityQueue:
     def __init__(self):
@@ -21,16 +27,61 @@ class PriorityQueue:
     def list(self):
         return self.elements
 
+# Compact event log written by a search running at full speed, replayed later by Visualizer.LogPlayer
+class SearchLog:
+    FRONTIER = 0
+    EXPANDED = 1
+    PATH = 2
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.rows = array('i')
+        self.cols = array('i')
+        self.caption = {}        # Texts shown while the search is replayed
+        self.final_caption = {}  # Texts shown once the replay has finished
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        return self.kinds[index], (self.rows[index], self.cols[index])
+
+    def add(self, kind, node):
+        self.kinds.append(kind)
+        self.rows.append(node[0])
+        self.cols.append(node[1])
+
+    def add_path(self, path):
+        for node in path:
+            self.add(SearchLog.PATH, node)
+
 class PathFinder(ABC):
-    def __init__(self, maze: list, visualizer: Visualizer.Visualizer):
+    def __init__(self, maze: list, visualizer: 'Visualizer.Visualizer' = None):
         self.maze = maze
         self.visualizer = visualizer
-        self.visualizer.set_map(maze)
+        if self.visualizer is not None:
+            self.visualizer.set_map(maze)
         self.time_limit = 0
+        self.budget = None
+        self.log = None
 
     def set_time_limit(self, time_limit):
         self.time_limit = time_limit
 
+    # Compute budget, unlike the time limit above this is about how long the search itself may run
+    def set_budget(self, budget: SearchBudget.SearchBudget):
+        self.budget = budget
+
+    def spend(self) -> bool:
+        # Count one expansion, False when the search has to stop
+        return self.budget is None or self.budget.expand()
+
+    def end_search(self, status, path=None):
+        # Record the outcome on the budget, only a solved search returns its path
+        if self.budget is not None:
+            self.budget.finish(status, path)
+        return path if status == SearchBudget.SOLVED else None
+
     class Node:
         def __init__(self, position, g_cost, h_cost, parent=None):
             self.position = position
@@ -47,14 +98,8 @@ class PathFinder(ABC):
     
     @staticmethod
     def get_neighbors(current: Tuple[int, int], maze):
-        neighbors = []
-        x, y = current
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < len(maze) and 0 <= ny < len(maze[0]) and maze[nx][ny] != -1:
-                neighbors.append((nx, ny))
-        return neighbors
+        # Worked out once per cell, don't change the returned list
+        return MazeContext.of(maze).adjacency[current]
     
     @staticmethod
     def reconstruct_path(came_from: Dict[Tuple[int, int], Optional[Tuple[int, int]]], 
@@ -69,37 +114,56 @@ class PathFinder(ABC):
         path.reverse()
         return path
 
+    def record_search(self, start: Tuple[int, int], goal: Tuple[int, int]):
+        # Run the search without drawing anything, keeping every step in a SearchLog
+        self.log = SearchLog()
+        try:
+            path = self.find_path(start, goal)
+        finally:
+            log, self.log = self.log, None
+        if path:
+            log.add_path(path)
+        return path, log
+
+    def record(self, kind, node):
+        if self.log is not None:
+            self.log.add(kind, node)
+
+    def pause(self, ms):
+        # Only wait when drawing live, a recorded search runs at full speed
+        if self.log is None and self.visualizer is not None:
+            self.visualizer.root.after(ms)
+
     def start_visualizer(self, start: Tuple[int, int], goal: Tuple[int, int], map: list = None):
         if map is not None:
             self.maze = map
             self.visualizer.set_map(map)
             
-        path = self.find_path(start, goal)
+        path, log = self.record_search(start, goal)
         
         if path:
             print("Path found:", path)
             print(f"Total moves: {len(path) - 1}")
-            for node in path:
-                self.visualizer.update_current(node)
-                self.visualizer.draw_screen()
-                self.visualizer.root.after(10)
-        
         else:
             print("No path found.")
         
+        self.visualizer.play_log(log)
 
     def visualize_step(self, current: Tuple[int, int] = None, headline = None, lvl_name = None, result = None, more_text = None):
+        if self.log is not None:
+            if current is not None:
+                self.log.add(SearchLog.EXPANDED, current)
+            caption = dict(headline=headline, lvl_name=lvl_name, result=result, more_text=more_text)
+            if result is None:
+                self.log.caption = caption
+            else:
+                self.log.final_caption = caption
+            return
+        if self.visualizer is None:
+            return
         self.visualizer.canvas.delete('all')
         self.visualizer.make_boxes()
-        lef_padding = len(self.maze[0]) * 50 + 20
-        if lvl_name is not None:
-            self.visualizer.canvas.create_text(lef_padding, 12, text=lvl_name, font=('Cascadia Code', 14, 'bold'), anchor='nw')
-        if headline is not None:
-            self.visualizer.canvas.create_text(lef_padding, 40, text=headline, font=('Cascadia Code', 14), anchor='nw')
-        if result is not None:
-            self.visualizer.canvas.create_text(lef_padding, 68, text=result[0], font=('Cascadia Code', 14), anchor='nw', fill=result[1])
-        if more_text is not None:
-            self.visualizer.canvas.create_text(lef_padding, 100, text=more_text, font=('Cascadia Code', 14), anchor='nw')
+        self.visualizer.draw_caption(lvl_name, headline, result, more_text)
         if current is not None:
             self.visualizer.update_current(current)
         self.visualizer.draw_screen()
@@ -122,6 +186,139 @@ class PathFinder(ABC):
         x, y = node
         return maze[x][y]
 
+    # Anytime search (ARA*): the search state is the cell here, PathFinderLevel2 adds the time
+    def start_state(self, start: Tuple[int, int]):
+        return start
+
+    @staticmethod
+    def state_cell(state) -> Tuple[int, int]:
+        return state
+
+    def successors(self, state, goal):
+        return [(next, self.cost_to_move()) for next in self.get_neighbors(state, self.maze)]
+
+    def anytime_paths(self, start: Tuple[int, int], goal: Tuple[int, int], deadline: float = None, max_expansions: int = None,
+                      weight: float = 3.0, weight_step: float = 0.5):
+        """Yields (path, cost, bound) with better and better paths until the search is optimal or out of budget.
+
+        The first path comes from A* with the heuristic inflated by weight, every later one lowers the weight
+        by weight_step and reuses the states already found. bound is the proven suboptimality factor of the
+        path, None when the budget ran out before any bound was proven. deadline is a time.perf_counter() value.
+        """
+        start_state = self.start_state(start)
+        g = {start_state: 0}
+        came_from = {start_state: None}
+        h = lambda state: self.heuristic(self.state_cell(state), goal)
+        counter = 0  # Keeps heap entries comparable without comparing states
+        open_list = []
+        closed = set()
+        incons = set()
+        goal_state = None
+        goal_cost = None  # Cost of the path path_to(goal_state) returns
+        expansions = 0
+
+        def key(state):
+            return g[state] + weight * h(state)
+
+        def out_of_budget():
+            if max_expansions is not None and expansions >= max_expansions:
+                return True
+            return deadline is not None and time.perf_counter() >= deadline
+
+        def improve_path():
+            nonlocal counter, goal_state, goal_cost, expansions
+            while open_list:
+                f, _, _, state = open_list[0]
+                if state in closed or f != key(state):
+                    heapq.heappop(open_list)  # Stale entry
+                    continue
+                if goal_state is not None and goal_cost <= f:
+                    return True
+                if out_of_budget() or not self.spend():
+                    return False
+                heapq.heappop(open_list)
+                closed.add(state)
+                expansions += 1
+                if self.state_cell(state) == goal:
+                    cost = path_cost(state)
+                    if goal_state is None or cost < path_cost(goal_state):
+                        goal_state = state
+                    goal_cost = path_cost(goal_state)
+                    continue
+                for next, cost in self.successors(state, goal):
+                    new_cost = g[state] + cost
+                    if next not in g or new_cost < g[next]:
+                        g[next] = new_cost
+                        came_from[next] = state
+                        if next in closed:
+                            incons.add(next)
+                        else:
+                            counter += 1
+                            heapq.heappush(open_list, (key(next), -new_cost, counter, next))
+            return True
+
+        def suboptimality_bound():
+            # Every optimal path still has a state in OPEN or INCONS, their smallest g + h bounds the optimum
+            candidates = [g[state] + h(state) for _, _, _, state in open_list if state not in closed] + [g[state] + h(state) for state in incons]
+            if not candidates:
+                return 1.0
+            return max(1.0, goal_cost / max(min(candidates), 1))
+
+        def states_to(state):
+            states = []
+            while state is not None:
+                states.append(state)
+                state = came_from[state]
+            states.reverse()
+            return states
+
+        def path_to(state):
+            return [self.state_cell(state) for state in states_to(state)]
+
+        def path_cost(state):
+            # Parents rewired after state was reached make the path cheaper than g[state], so add up the moves
+            states = states_to(state)
+            return sum(dict(self.successors(before, goal))[after] for before, after in zip(states, states[1:]))
+
+        heapq.heappush(open_list, (key(start_state), 0, counter, start_state))
+        best_cost = best_bound = None
+        while True:
+            finished = improve_path()
+            if goal_state is not None:
+                self.end_search(SearchBudget.SOLVED, path_to(goal_state))
+            elif finished:
+                self.end_search(SearchBudget.INFEASIBLE)
+            else:
+                self.end_search(SearchBudget.BUDGET_EXHAUSTED)
+            if goal_state is not None:
+                goal_cost = path_cost(goal_state)
+                # A cheaper path keeps the previous bound, a finished round proves a new one
+                bound = min(weight, suboptimality_bound()) if finished else best_bound
+                tighter = bound is not None and (best_bound is None or bound < best_bound)
+                if best_cost is None or goal_cost < best_cost or tighter:
+                    best_cost, best_bound = goal_cost, bound
+                    yield path_to(goal_state), best_cost, best_bound
+            if not finished or weight <= 1 or out_of_budget() or (self.budget is not None and self.budget.stopped()):
+                return
+            # Lower the weight, move INCONS back to OPEN and recompute the keys
+            weight = max(1.0, weight - weight_step)
+            states = {state for _, _, _, state in open_list if state not in closed} | incons
+            incons.clear()
+            closed.clear()
+            open_list = []
+            for state in states:
+                counter += 1
+                open_list.append((key(state), -g[state], counter, state))
+            heapq.heapify(open_list)
+
+    def find_path_anytime(self, start: Tuple[int, int], goal: Tuple[int, int], deadline: float = None, max_expansions: int = None,
+                          weight: float = 3.0, weight_step: float = 0.5):
+        # Best path found before the budget ran out, with its suboptimality bound
+        best = None, None, None
+        for best in self.anytime_paths(start, goal, deadline, max_expansions, weight, weight_step):
+            pass
+        return best
+
     @abstractmethod
     def find_path(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
         pass
@@ -132,12 +329,14 @@ class BFSPathFinder(PathFinder):
     def find_path(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
         if start == goal:
             self.visualize_step(headline='Breadth first Search', lvl_name='Level 1: Basic', result=('Success. Total cost: 1', 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-            return [start]
+            return self.end_search(SearchBudget.SOLVED, [start])
 
         frontier = [(start, [start])]
         reached = set([start])
 
         while frontier:
+            if not self.spend():
+                return self.end_search(SearchBudget.BUDGET_EXHAUSTED, min(frontier, key=lambda entry: self.heuristic(entry[0], goal))[1])
             current, path = frontier.pop(0)
             # self.visualizer.canvas.create_text(690, 12, text='Algorithm: Breadth first Search', font=('Cascadia Code', 14))
             self.visualize_step(current, 'Breadth first Search', 'Level 1: Basic', more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
@@ -147,26 +346,29 @@ class BFSPathFinder(PathFinder):
                 if next_node == goal:
                     path = path + [next_node]
                     self.visualize_step(headline='Breadth first Search', lvl_name='Level 1: Basic', result=('Success. Total cost: ' + str(len(path) - 1), 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-                    return path
+                    return self.end_search(SearchBudget.SOLVED, path)
                 if next_node not in reached:
                     reached.add(next_node)
                     frontier.append((next_node, path + [next_node]))
+                    self.record(SearchLog.FRONTIER, next_node)
         
         self.visualize_step(headline='Breadth first Search', lvl_name='Level 1: Basic', result=('No path found :<', 'red'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-        return None
+        return self.end_search(SearchBudget.INFEASIBLE)
     
     
 class DFSPathFinder(PathFinder):
     def find_path(self, start: Tuple[int], goal: Tuple[int]) -> List[Tuple[int]] | None:
         if start == goal:
             self.visualize_step(headline='Depth-first Search', lvl_name='Level 1: Basic', result=('Success. Total cost: 1', 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-            return [start]
+            return self.end_search(SearchBudget.SOLVED, [start])
         
         stack = [(start, [start])]
         visited = set()
         visited.add(start)
         
         while stack:
+            if not self.spend():
+                return self.end_search(SearchBudget.BUDGET_EXHAUSTED, min(stack, key=lambda entry: self.heuristic(entry[0], goal))[1])
             current, path = stack.pop()
             self.visualize_step(current, 'Depth-first Search', 'Level 1: Basic', more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
 
@@ -175,29 +377,35 @@ class DFSPathFinder(PathFinder):
                     if next == goal:
                         path = path + [next]
                         self.visualize_step(headline='Depth-first Search', lvl_name='Level 1: Basic', result=('Success. Total cost: ' + str(len(path) - 1), 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-                        return path
+                        return self.end_search(SearchBudget.SOLVED, path)
                     stack.append((next, path + [next]))
                     visited.add(next)
+                    self.record(SearchLog.FRONTIER, next)
         
         self.visualize_step(headline='Depth-first Search', lvl_name='Level 1: Basic', result=('No path found :<', 'red'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-        return None
+        return self.end_search(SearchBudget.INFEASIBLE)
 class UCSPathFinder(PathFinder):
     def find_path(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
         visited = set()
-        frontier = PriorityQueue()
+        frontier = BucketQueue()
         frontier.put(0, start)  # Note the order: (priority, item)
         came_from = {start: None}
         cost_so_far = {start: 0}
 
         while not frontier.empty():
             current = frontier.get()
+            if current in visited:
+                continue  # Stale entry, the cell was already expanded with a lower cost
+            if not self.spend():
+                closest = min(came_from, key=lambda node: self.heuristic(node, goal))
+                return self.end_search(SearchBudget.BUDGET_EXHAUSTED, self.reconstruct_path(came_from, start, closest))
             
             self.visualize_step(current, 'Uniform-cost Search', 'Level 1: Basic', more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
 
             if current == goal:
                 path = self.reconstruct_path(came_from, start, goal)
                 self.visualize_step(headline='Uniform-cost Search', lvl_name='Level 1: Basic', result=('Success. Total cost: ' + str(len(path) - 1), 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-                return path
+                return self.end_search(SearchBudget.SOLVED, path)
 
             visited.add(current)
 
@@ -208,9 +416,10 @@ class UCSPathFinder(PathFinder):
                     priority = new_cost
                     frontier.put(priority, neighbor)
                     came_from[neighbor] = current
+                    self.record(SearchLog.FRONTIER, neighbor)
 
         self.visualize_step(headline='Uniform-cost Search', lvl_name='Level 1: Basic', result=('No path found :<', 'red'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-        return None
+        return self.end_search(SearchBudget.INFEASIBLE)
 
     
 
@@ -218,7 +427,7 @@ class GBFSPathFinder(PathFinder):
     def find_path(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
         if start == goal:
             self.visualize_step(headline='Greedy best first Search', lvl_name='Level 1: Basic', result=('Success. Total cost: 1', 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-            return [start]
+            return self.end_search(SearchBudget.SOLVED, [start])
         
         frontier = PriorityQueue()
         frontier.put(0, start)
@@ -227,48 +436,147 @@ class GBFSPathFinder(PathFinder):
         
         while not frontier.empty():
             current = frontier.get()
+            if not self.spend():
+                closest = min(came_from, key=lambda node: self.heuristic(node, goal))
+                return self.end_search(SearchBudget.BUDGET_EXHAUSTED, self.reconstruct_path(came_from, start, closest))
             
             self.visualize_step(current, 'Greedy best first Search', 'Level 1: Basic', more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
             
             if current == goal:
                 path = self.reconstruct_path(came_from, start, goal)
                 self.visualize_step(headline='Greedy best first Search', lvl_name='Level 1: Basic', result=('Success. Total cost: ' + str(len(path) - 1), 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-                return path
+                return self.end_search(SearchBudget.SOLVED, path)
             
             for child in self.get_neighbors(current, self.maze):
                 if child not in reached:
                     reached.add(child)
                     came_from[child] = current
-                    frontier.put(self.heuristic(child, goal), child) 
+                    frontier.put(self.heuristic(child, goal), child)
+                    self.record(SearchLog.FRONTIER, child)
                     
         self.visualize_step(headline='Greedy best first Search', lvl_name='Level 1: Basic', result=('No path found :<', 'red'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-        return None
+        return self.end_search(SearchBudget.INFEASIBLE)
         
 class AStarPathFinder(PathFinder):
     def find_path(self, start: Tuple[int], goal: Tuple[int]) -> List[Tuple[int]] | None:
-        frontier = PriorityQueue()
-        frontier.put(0, (0, start, []))  # (priority, (path cost, current position, path))
+        frontier = BucketQueue()
+        frontier.put(0, (0, start))  # (priority, (path cost, current position))
+        came_from = {start: None}
         reached = {}
         reached[start] = 0
         
         while not frontier.empty():
-            path_cost, current, path = frontier.get()
-            path = path + [current]
+            path_cost, current = frontier.get()
+            if path_cost > reached[current]:
+                continue  # Stale entry, a cheaper way to this cell was found later
+            if not self.spend():
+                _, closest = min([(path_cost, current)] + list(frontier), key=lambda entry: self.heuristic(entry[1], goal))
+                return self.end_search(SearchBudget.BUDGET_EXHAUSTED, self.reconstruct_path(came_from, start, closest))
             self.visualize_step(current, 'A* Search', 'Level 1: Basic')
             
             if current == goal:
+                path = self.reconstruct_path(came_from, start, goal)
                 self.visualize_step(headline='A* Search', lvl_name='Level 1: Basic', result=('Success. Total cost: ' + str(len(path) - 1), 'green'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-                return path  
+                return self.end_search(SearchBudget.SOLVED, path)
             
             for next in self.get_neighbors(current, self.maze):
                 new_cost = path_cost + self.cost_to_move()
                 if next not in reached or new_cost < reached[next]:
                     reached[next] = new_cost
+                    came_from[next] = current
                     priority = new_cost + self.heuristic(next, goal)
-                    frontier.put(priority, (new_cost, next, path))
+                    frontier.put(priority, (new_cost, next), new_cost)
+                    self.record(SearchLog.FRONTIER, next)
         
         self.visualize_step(headline='A* Search', lvl_name='Level 1: Basic', result=('No path found :<', 'red'), more_text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm')
-        return None  
+        return self.end_search(SearchBudget.INFEASIBLE)
+
+# Memory-bounded A*: iterative deepening on f = g + h, so only the current branch is kept.
+# A transposition table of the cheapest g seen per cell in this iteration prunes repeated cells. When it
+# holds max_table_size cells the entries with the highest f are forgotten first, the cells near the start
+# that prune the largest subtrees stay, so a small table only costs repeated work. With the consistent
+# Manhattan heuristic the first goal found is still a shortest path.
+# Iterative deepening never learns that the goal can't be reached, every round just raises the bound, so
+# the query is checked first with a flood fill over a bitmap of the cells.
+class IDAStarPathFinder(PathFinder):
+    max_table_size = 1 << 16
+
+    def set_memory_cap(self, max_table_size: int):
+        self.max_table_size = max_table_size
+
+    def connected(self, start, goal) -> bool:
+        # Best-first towards the goal, a reachable goal close by is found without going over the rest of the map
+        seen = {start}
+        frontier = BucketQueue()
+        frontier.put(self.heuristic(start, goal), start)
+        while not frontier.empty():
+            cell = frontier.get()
+            if cell == goal:
+                return True
+            for next_node in self.get_neighbors(cell, self.maze):
+                if next_node not in seen:
+                    seen.add(next_node)
+                    frontier.put(self.heuristic(next_node, goal), next_node)
+        return False
+
+    def find_path(self, start: Tuple[int], goal: Tuple[int]) -> List[Tuple[int]] | None:
+        if start == goal:
+            return self.end_search(SearchBudget.SOLVED, [start])
+        if not self.connected(start, goal):
+            self.visualize_step(headline='IDA* Search', lvl_name='Level 1: Basic', result=('No path found :<', 'red'))
+            return self.end_search(SearchBudget.INFEASIBLE)
+        bound = self.heuristic(start, goal)
+        closest = (bound, start)
+        closest_path = [start]
+        while True:
+            table = {}
+            highest = []  # Heap of (-f, cell, g) over the table entries, stale ones are skipped
+            path = [start]
+            on_path = {start}
+            branches = [iter(self.get_neighbors(start, self.maze))]
+            next_bound = float('inf')
+            while branches:
+                neighbor = next(branches[-1], None)
+                if neighbor is None:
+                    branches.pop()
+                    on_path.discard(path.pop())
+                    continue
+                if neighbor in on_path:
+                    continue
+                g = len(path)
+                f = g + self.heuristic(neighbor, goal)
+                if f > bound:
+                    next_bound = min(next_bound, f)
+                    continue
+                if table.get(neighbor, float('inf')) <= g:
+                    continue  # Already searched from here with at least as much room left
+                table[neighbor] = g
+                heapq.heappush(highest, (-f, neighbor, g))
+                while len(table) > self.max_table_size:
+                    _, cell, cell_g = heapq.heappop(highest)
+                    if table.get(cell) == cell_g:
+                        del table[cell]
+                if len(highest) > 2 * self.max_table_size:
+                    highest = [(-cell_g - self.heuristic(cell, goal), cell, cell_g) for cell, cell_g in table.items()]
+                    heapq.heapify(highest)
+
+                if not self.spend():
+                    return self.end_search(SearchBudget.BUDGET_EXHAUSTED, closest_path)
+                path.append(neighbor)
+                on_path.add(neighbor)
+                self.visualize_step(neighbor, 'IDA* Search', 'Level 1: Basic')
+                if (self.heuristic(neighbor, goal), neighbor) < closest:
+                    closest, closest_path = (self.heuristic(neighbor, goal), neighbor), list(path)
+
+                if neighbor == goal:
+                    self.visualize_step(headline='IDA* Search', lvl_name='Level 1: Basic', result=('Success. Total cost: ' + str(len(path) - 1), 'green'))
+                    return self.end_search(SearchBudget.SOLVED, path)
+                branches.append(iter(self.get_neighbors(neighbor, self.maze)))
+
+            if next_bound == float('inf'):
+                self.visualize_step(headline='IDA* Search', lvl_name='Level 1: Basic', result=('No path found :<', 'red'))
+                return self.end_search(SearchBudget.INFEASIBLE)
+            bound = next_bound
 
 # Implement A* algorithm for level 2: Time limitation    
 class PathFinderLevel2(PathFinder):
@@ -276,36 +584,84 @@ class PathFinderLevel2(PathFinder):
         x, y = node
         return maze[x][y]
 
+    @staticmethod
+    def enter_time(node, maze):
+        # Time for stepping into a cell, the move and its toll wait
+        x, y = node
+        return PathFinder.cost_to_move() + maze[x][y]
+
+    def time_needed(self, goal) -> DistanceField.DistanceField:
+        # Least time from every cell to goal, a state that can't make it within the time limit is dropped
+        return DistanceField.field_cache.get(self.maze, goal, self.enter_time)
+
+    @staticmethod
+    def state_path(came_from, state) -> List[Tuple[int]]:
+        path = []
+        while state is not None:
+            path.append(state[0])
+            state = came_from[state]
+        path.reverse()
+        return path
+
+    # States for the anytime search are (position, time), moves that break the time limit are left out
+    def start_state(self, start):
+        return (start, 0)
+
+    @staticmethod
+    def state_cell(state):
+        return state[0]
+
+    def successors(self, state, goal):
+        current, current_time = state
+        time_needed = self.time_needed(goal)
+        next_states = []
+        for next in self.get_neighbors(current, self.maze):
+            new_time = current_time + self.cost_to_move() + self.wait_time(next, self.maze)
+            if new_time + time_needed[next] <= self.time_limit:
+                next_states.append(((next, new_time), self.cost_to_move()))
+        return next_states
+
     def find_path(self, start: Tuple[int], goal: Tuple[int]) -> Optional[List[Tuple[int]]]:
-        frontier = PriorityQueue()
-        frontier.put(0 + self.heuristic(start, goal), (0, 0, start, []))  # (priority, (path cost, current_time, current position, path))
+        frontier = BucketQueue()
+        frontier.put(0 + self.heuristic(start, goal), (0, (start, 0)))  # (priority, (path cost, (current position, current_time)))
+        came_from = {(start, 0): None}  # Parent of every state, the path is only built once at the end
         reached = {}  # Dictionary to store the states with start position, time
         reached[(start, 0)] = 0  # The value of the key is the path cost of that state(positions, time)
         
         self.visualize_step(headline='A* Search with time limit of ' + str(self.time_limit), lvl_name='Level 2: Time limitation')
-        self.visualizer.root.after(600)
+        self.pause(600)
+
+        time_needed = self.time_needed(goal)
+        if time_needed[start] > self.time_limit:
+            # Even the quickest way to the goal takes too long, no need to search
+            self.visualize_step(headline='A* Search with time limit of ' + str(self.time_limit), lvl_name='Level 2: Time limitation', result=('No path found :<', 'red'))
+            return self.end_search(SearchBudget.INFEASIBLE)
         
         while not frontier.empty():
-            path_cost, current_time, current, path = frontier.get()
-            path = path + [current]
-            # Uncomment the line below for expanded node animation
-            # self.visualize_step(current)
-            # print('Check:', current)
+            path_cost, state = frontier.get()
+            current, current_time = state
+            if path_cost > reached[state]:
+                continue  # Stale entry
+            if not self.spend():
+                _, closest = min([(path_cost, state)] + list(frontier), key=lambda entry: self.heuristic(entry[1][0], goal))
+                return self.end_search(SearchBudget.BUDGET_EXHAUSTED, self.state_path(came_from, closest))
+            self.record(SearchLog.EXPANDED, current)
             
             if current == goal:
-                print('Total time:', current_time)
                 self.visualize_step(headline='A* Search with time limit of ' + str(self.time_limit), lvl_name='Level 2: Time limitation', result=('Success. Total time: ' + str(current_time), 'green'))
-                return path 
+                return self.end_search(SearchBudget.SOLVED, self.state_path(came_from, state))
             
             for next in self.get_neighbors(current, self.maze):
                 new_cost = path_cost + self.cost_to_move()
                 new_time = current_time + self.cost_to_move() + self.wait_time(next, self.maze)
                 
-                state = (next, new_time)
-                if new_time <= self.time_limit and (state not in reached or new_cost < reached[state]):
-                    reached[state] = new_cost
+                next_state = (next, new_time)
+                if new_time + time_needed[next] <= self.time_limit and (next_state not in reached or new_cost < reached[next_state]):
+                    reached[next_state] = new_cost
+                    came_from[next_state] = state
                     priority = new_cost + self.heuristic(next, goal)
-                    frontier.put(priority, (new_cost, new_time, next, path))
+                    frontier.put(priority, (new_cost, next_state), new_cost)
+                    self.record(SearchLog.FRONTIER, next)
         
         self.visualize_step(headline='A* Search with time limit of ' + str(self.time_limit), lvl_name='Level 2: Time limitation', result=('No path found :<', 'red'))
-        return None  # No path found within time limit
\ No newline at end of file
+        return self.end_search(SearchBudget.INFEASIBLE)  # No path found within time limit
\ No newline at end of file
@@ -0,0 +1,100 @@
+import level4
+
+# Checks a merged level 4 plan, the list of (agent name, from, to, action) steps merge_paths and
+# generate_new_subagent_and_recreate_path return, in a single pass.
+# Time steps are split the way PathAnimator plays them: a step by an agent already seen in the current time
+# step starts the next one. Agents without a step in a time step stand still. The occupancy of every cell is
+# kept in one dictionary that is updated as agents move, so memory stays proportional to the number of agents
+# however long the plan is.
+#
+# Every violation is reported as (step index, kind, agent name, message), the index is the position of the
+# offending step in the plan.
+
+VERTEX = 'vertex'  # Two agents on the same cell at the end of a time step
+SWAP = 'swap'      # Two agents trading cells during a time step
+JUMP = 'jump'      # A step that doesn't start where the agent is, or isn't a move to a neighbour or a wait
+WALL = 'wall'      # A step into a wall or off the map
+FUEL = 'fuel'      # A move with an empty tank
+TIME = 'time'      # The agent's time (calculate_path_time) went over its time limit
+
+def validate_plan(plan, maze, fuel_capacity, agents=None):
+    """Every violation in plan, an empty list for a valid plan. agents gives the start cell, starting fuel and
+    time limit of each agent, without it the first step of an agent sets its start, the tank starts full and
+    time isn't checked."""
+    rows, cols = len(maze), len(maze[0])
+    by_name = {agent.name: agent for agent in agents or []}
+    position = {}  # agent -> cell
+    fuel = {}
+    time = {}
+    occupied = {}  # cell -> agent on it
+    for agent in by_name.values():
+        position[agent.name] = agent.start
+        fuel[agent.name] = agent.fuel
+        time[agent.name] = 0
+        occupied[agent.start] = agent.name
+
+    violations = []
+    moves = {}  # (from, to) -> (agent, step index), moves of the current time step
+
+    def end_time_step():
+        # Movers leave their old cells first so that following an agent into the cell it leaves is fine
+        for (before, _), (name, _) in moves.items():
+            if occupied.get(before) == name:
+                del occupied[before]
+        for (before, after), (name, index) in moves.items():
+            other = occupied.get(after)
+            if other is not None and other != name:
+                violations.append((index, VERTEX, name, f'{name} and {other} both on {after}'))
+            else:
+                occupied[after] = name
+            swapped = moves.get((after, before))
+            if swapped is not None and swapped[0] < name:  # Reported once, by the second agent in name order
+                violations.append((index, SWAP, name, f'{name} and {swapped[0]} swap {before} and {after}'))
+        moves.clear()
+
+    names = set()  # Agents with a step in the current time step
+    for index, step in enumerate(plan):
+        name, before, after, action = step
+        if name in names:
+            end_time_step()
+            names.clear()
+        names.add(name)
+
+        if name not in position:
+            position[name] = before
+            fuel[name] = fuel_capacity
+            time[name] = 0
+            if occupied.get(before, name) != name:
+                violations.append((index, VERTEX, name, f'{name} starts on {before} next to {occupied[before]}'))
+            occupied.setdefault(before, name)
+        if before != position[name]:
+            violations.append((index, JUMP, name, f'{name} is on {position[name]}, not {before}'))
+        if action == 'createnewgoal':
+            continue  # Only sets the agent's next goal, the agent stays put
+
+        x, y = after
+        if not (0 <= x < rows and 0 <= y < cols) or maze[x][y] == -1:
+            violations.append((index, WALL, name, f'{name} steps into {after}'))
+            continue
+        if abs(x - before[0]) + abs(y - before[1]) > 1:
+            violations.append((index, JUMP, name, f'{name} jumps from {before} to {after}'))
+
+        if after != before:
+            if level4.is_gas_station(after, maze):
+                fuel[name] = fuel_capacity
+            elif fuel[name] == 0:
+                violations.append((index, FUEL, name, f'{name} moves to {after} with an empty tank'))
+            else:
+                fuel[name] -= 1
+            moves[(position[name], after)] = (name, index)
+
+        agent = by_name.get(name)
+        if agent is not None:
+            previous = time[name]
+            time[name] += level4.step_time(step, maze)
+            if previous <= agent.time_limit < time[name]:
+                violations.append((index, TIME, name, f'{name} takes {time[name]}, over the limit of {agent.time_limit}'))
+        position[name] = after
+
+    end_time_step()
+    return violations
@@ -0,0 +1,234 @@
+import importlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import SearchBudget
+import MazeContext
+from multiprocessing.connection import wait
+
+# Races several path finders on the same level 1 query and keeps the first answer that meets the requested
+# guarantee. Every engine has its own worker process, started once and reused for every query. A map is sent
+# to the workers once and kept there under a key, with its MazeContext, so queries only carry the key, start and
+# goal and the engines' caches of the map last from one query to the next. A query is handed to all workers,
+# which wait at a shared barrier and start searching together, so the time it takes to get the query to a
+# worker doesn't pick the winner. Once there is an answer the others are cancelled through their budget and
+# report how far they got.
+# Which engine wins depends on the shape of the map, so the winners and the time each engine took are kept
+# per map class and can be saved, best_engines() then lists the engines that won most often on maps like the
+# one given.
+
+# engine -> (module, optimal). Optimal engines always return a shortest path on level 1's unit moves
+ENGINES = {
+    'AStarPathFinder': ('PathFinder', True),
+    'UCSPathFinder': ('PathFinder', True),
+    'BFSPathFinder': ('PathFinder', True),
+    'IDAStarPathFinder': ('PathFinder', True),
+    'GBFSPathFinder': ('PathFinder', False),
+    'DFSPathFinder': ('PathFinder', False),
+    'HierarchicalPathFinder': ('Hierarchical', False),
+}
+# Answers that settle the query. A finder that ran out of budget didn't answer
+ANSWERS = (SearchBudget.SOLVED, SearchBudget.INFEASIBLE)
+CANCEL_GRACE = 5.0  # Seconds a cancelled engine gets to report before its worker is replaced
+POLL = 0.5  # Seconds between checks that the workers are still alive
+MAX_MAPS = 4  # Maps the workers keep, the oldest one sent is dropped first
+
+def map_class(maze) -> str:
+    # Rough size and wall density, e.g. 'small-open'
+    cells = len(maze) * len(maze[0])
+    walls = sum(row.count(-1) for row in maze) / cells
+    size = 'small' if cells <= 400 else 'medium' if cells <= 10000 else 'large'
+    density = 'open' if walls < 0.15 else 'mixed' if walls < 0.35 else 'dense'
+    return f'{size}-{density}'
+
+def engine_worker(engine, connection, barrier, cancel):
+    # Runs in a worker process until it gets None. Keeps the maps it is sent as ('map', key, maze, dropped
+    # keys) and answers every ('query', key, start, goal, time limit) with (status, path, seconds) on its own
+    # pipe, a worker killed while sending can't block the others
+    finder_class = getattr(importlib.import_module(ENGINES[engine][0]), engine)
+    token = SearchBudget.CancellationToken(cancel)
+    maps = {}  # key -> maze
+    while True:
+        task = connection.recv()
+        if task is None:
+            return
+        if task[0] == 'map':
+            _, key, maze, dropped = task
+            for old_key in dropped:
+                maps.pop(old_key, None)
+            maps[key] = maze
+            MazeContext.of(maze)  # Before any query is timed
+            continue
+        _, key, start, goal, time_limit = task
+        maze = maps[key]
+        try:
+            barrier.wait(CANCEL_GRACE)
+        except threading.BrokenBarrierError:
+            pass  # Some worker never got there, start anyway
+        started = time.perf_counter()
+        try:
+            finder = finder_class(maze)
+            budget = SearchBudget.SearchBudget(time_limit, token=token)
+            finder.set_budget(budget)
+            path = finder.find_path(start, goal)
+            connection.send((budget.status, path, time.perf_counter() - started))
+        except Exception as error:
+            connection.send((repr(error), None, time.perf_counter() - started))
+
+class Portfolio:
+    def __init__(self, engines=None, optimal=True, stats_path=None):
+        """engines defaults to every engine in ENGINES that meets the guarantee, only optimal ones when optimal is
+        True. stats_path is a JSON file the winners and engine times are loaded from and saved to."""
+        if engines is None:
+            engines = [engine for engine, (_, is_optimal) in ENGINES.items() if is_optimal or not optimal]
+        if optimal and not all(ENGINES[engine][1] for engine in engines):
+            raise ValueError('optimal portfolios can only race optimal engines')
+        self.engines = list(engines)
+        self.optimal = optimal
+        self.stats_path = stats_path
+        self.wins = {}     # map class -> Counter of winning engines
+        self.seconds = {}  # map class -> {engine: [total seconds, answers]} over the queries the engine answered
+        if stats_path is not None and os.path.exists(stats_path):
+            with open(stats_path) as file:
+                stats = json.load(file)
+            self.wins = {key: Counter(counts) for key, counts in stats.get('wins', {}).items()}
+            self.seconds = stats.get('seconds', {})
+        # Spawned workers start from a clean interpreter, which is safe next to the planner threads
+        self.context = multiprocessing.get_context('spawn')
+        self.workers = None  # engine -> (process, pipe), started by the first query
+        self.maps = OrderedDict()  # (id(maze), version) -> (maze, key, map class) of the maps the workers keep
+        self.next_key = 0
+
+    def start(self):
+        # Starting the processes takes a few hundred milliseconds, it is only paid once
+        if self.workers is not None:
+            return
+        self.barrier = self.context.Barrier(len(self.engines))
+        self.cancel = self.context.Event()
+        self.workers = {}
+        for engine in self.engines:
+            self.start_worker(engine)
+
+    def start_worker(self, engine):
+        connection, worker_connection = self.context.Pipe()
+        worker = self.context.Process(target=engine_worker, args=(engine, worker_connection, self.barrier, self.cancel), daemon=True)
+        worker.start()
+        worker_connection.close()
+        self.workers[engine] = (worker, connection)
+        for maze, key, _ in self.maps.values():
+            connection.send(('map', key, maze, []))  # A replaced worker gets the maps the others have
+
+    def stop_worker(self, engine):
+        worker, connection = self.workers.pop(engine)
+        worker.terminate()
+        worker.join()
+        connection.close()
+
+    def close(self):
+        if self.workers is None:
+            return
+        for worker, connection in self.workers.values():
+            try:
+                connection.send(None)
+            except OSError:
+                pass  # Already gone
+        for engine, (worker, _) in list(self.workers.items()):
+            worker.join(CANCEL_GRACE)
+            self.stop_worker(engine)
+        self.workers = None
+        self.maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def best_engines(self, maze) -> list:
+        # The engines ordered by how often they won on this class of map
+        wins = self.wins.get(map_class(maze), Counter())
+        return sorted(self.engines, key=lambda engine: -wins[engine])
+
+    def mean_seconds(self, maze) -> dict:
+        # engine -> mean seconds to answer on this class of map, for the engines that answered there
+        return {engine: total / count for engine, (total, count) in self.seconds.get(map_class(maze), {}).items()}
+
+    def send_map(self, maze):
+        # The key and map class of maze, sending it to the workers the first time. A Grid written to since is
+        # sent again, a plain list changed in place has to be passed as a new list
+        entry_key = (id(maze), getattr(maze, 'version', None))
+        entry = self.maps.get(entry_key)
+        if entry is not None and entry[0] is maze:
+            return entry[1], entry[2]
+        dropped = []
+        while len(self.maps) >= MAX_MAPS:
+            dropped.append(self.maps.popitem(last=False)[1][1])
+        key = self.next_key
+        self.next_key += 1
+        self.maps[entry_key] = (maze, key, map_class(maze))
+        for _, connection in self.workers.values():
+            connection.send(('map', key, maze, dropped))
+        return key, self.maps[entry_key][2]
+
+    def find_path(self, maze, start, goal, time_limit=None):
+        """Returns (path, status, winner, seconds, engines). path is None unless status is SOLVED, winner is None
+        when no engine answered within time_limit seconds. seconds counts from once the map is with the workers,
+        engines maps every engine to (status, seconds) from the barrier to its report."""
+        self.start()
+        key, kind = self.send_map(maze)
+        started = time.perf_counter()
+        self.cancel.clear()
+        for _, connection in self.workers.values():
+            connection.send(('query', key, start, goal, time_limit))
+
+        answer = (None, SearchBudget.BUDGET_EXHAUSTED, None)
+        reports = {}
+        deadline = None if time_limit is None else started + time_limit + 1
+        cancelled = None
+        while len(reports) < len(self.engines):
+            now = time.perf_counter()
+            if cancelled is None and (answer[2] is not None or (deadline is not None and now >= deadline)):
+                self.cancel.set()  # The others stop at their next budget check
+                cancelled = now
+            if cancelled is not None and now - cancelled > CANCEL_GRACE:
+                break
+            waiting = {connection: engine for engine, (_, connection) in self.workers.items() if engine not in reports}
+            for connection in wait(list(waiting), POLL):
+                engine = waiting[connection]
+                try:
+                    status, path, seconds = connection.recv()
+                except (EOFError, OSError):
+                    reports[engine] = ('worker died', None)
+                    continue
+                reports[engine] = (status, seconds)
+                if status in ANSWERS and answer[2] is None:
+                    answer = (path, status, engine)
+        self.cancel.set()
+
+        # Engines that died or didn't stop when cancelled are replaced, the next query starts with a full pool
+        for engine in self.engines:
+            if engine not in reports or not self.workers[engine][0].is_alive():
+                self.stop_worker(engine)
+                self.start_worker(engine)
+                reports.setdefault(engine, (SearchBudget.CANCELLED, None))
+        if self.barrier.broken:
+            self.barrier.reset()
+
+        path, status, winner = answer
+        if winner is not None:
+            self.wins.setdefault(kind, Counter())[winner] += 1
+        for engine, (engine_status, seconds) in reports.items():
+            if engine_status in ANSWERS:
+                total = self.seconds.setdefault(kind, {}).setdefault(engine, [0.0, 0])
+                total[0] += seconds
+                total[1] += 1
+        return path, status, winner, time.perf_counter() - started, reports
+
+    def save(self):
+        if self.stats_path is not None:
+            with open(self.stats_path, 'w') as file:
+                json.dump({'wins': self.wins, 'seconds': self.seconds}, file, indent=2)
@@ -0,0 +1,165 @@
+import numpy as np
+from PIL import Image, ImageTk
+
+# Large map mode for the Visualizer.
+# The whole grid is kept as one RGB array (one pixel per cell), only the visible viewport is cut out,
+# scaled and pushed to the canvas as a single image. Frontier, path and agents are overlay layers
+# painted on top of the cut out, cell labels are only drawn when zoomed in far enough to read them.
+class RasterView:
+    MIN_ZOOM = 1 / 16
+    MAX_ZOOM = 64
+    LABEL_ZOOM = 24  # Pixels per cell from which cell values are written
+    GRID_ZOOM = 8    # Pixels per cell from which grid lines are drawn
+
+    def __init__(self, visualizer, width=1000, height=700):
+        self.visualizer = visualizer
+        self.canvas = visualizer.canvas
+        self.width = width
+        self.height = height
+        self.zoom = 1.0
+        self.row = 0.0  # Top left cell of the viewport
+        self.col = 0.0
+        self.base = None
+        self.overlay = None
+        self.overlay_mask = None
+        self.agents = {}  # name -> (cell, color)
+        self.photo = None
+        self.drag_from = None
+
+        # Kept so close() removes exactly these handlers from the shared canvas
+        self.bindings = [(sequence, self.canvas.bind(sequence, handler, add='+')) for sequence, handler in [
+            ("<ButtonPress-1>", self.start_drag),
+            ("<B1-Motion>", self.drag),
+            ("<MouseWheel>", lambda event: self.zoom_at(event.x, event.y, 2 if event.delta > 0 else 0.5)),
+            ("<Button-4>", lambda event: self.zoom_at(event.x, event.y, 2)),
+            ("<Button-5>", lambda event: self.zoom_at(event.x, event.y, 0.5)),
+        ]]
+
+    def close(self):
+        # Stop reacting to the mouse, the Visualizer is going back to drawing boxes
+        for sequence, funcid in self.bindings:
+            self.canvas.unbind(sequence, funcid)
+        self.bindings = []
+        self.canvas.delete('raster')
+        self.base = None
+
+    def set_map(self, maze: list):
+        rows, cols = len(maze), len(maze[0])
+        # One color lookup per distinct cell value, then the whole grid is filled by indexing the palette
+        values, cells = np.unique(np.asarray(maze), return_inverse=True)
+        palette = np.array([self.rgb(self.cell_color(value.item())) for value in values], dtype=np.uint8)
+        self.base = palette[cells.reshape(rows, cols)]
+        self.overlay = np.zeros_like(self.base)
+        self.overlay_mask = np.zeros((rows, cols), dtype=bool)
+        self.agents.clear()
+        # Start with the whole map in view
+        self.zoom = self.fit_zoom(rows, cols)
+        self.row = self.col = 0.0
+
+    def cell_color(self, value):
+        colors = self.visualizer.colors
+        if value in colors:
+            return colors[value]
+        if isinstance(value, str) and any(c.isalpha() for c in value):
+            return colors[value[0]]
+        return '#dae8fc'
+
+    def rgb(self, color):
+        r, g, b = self.visualizer.root.winfo_rgb(color)
+        return r // 257, g // 257, b // 257
+
+    def fit_zoom(self, rows, cols):
+        zoom = self.MAX_ZOOM
+        while zoom > self.MIN_ZOOM and (rows * zoom > self.height or cols * zoom > self.width):
+            zoom /= 2
+        return zoom
+
+    def paint(self, cells, color):
+        rgb = self.rgb(color)
+        for j, i in cells:
+            self.overlay[j, i] = rgb
+            self.overlay_mask[j, i] = True
+
+    def clear_overlay(self):
+        self.overlay_mask[:] = False
+
+    def set_agent(self, name, cell, color):
+        self.agents[name] = (cell, color)
+
+    # Screen position of a cell at the current pan and zoom
+    def cell_box(self, j, i):
+        x0 = (i - self.col) * self.zoom + self.visualizer.PAD
+        y0 = (j - self.row) * self.zoom + self.visualizer.PAD
+        return x0, y0, x0 + self.zoom, y0 + self.zoom
+
+    def visible_cells(self):
+        rows, cols = self.base.shape[:2]
+        r0, c0 = int(self.row), int(self.col)
+        r1 = min(rows, r0 + int(np.ceil(self.height / self.zoom)) + 1)
+        c1 = min(cols, c0 + int(np.ceil(self.width / self.zoom)) + 1)
+        return r0, r1, c0, c1
+
+    def render(self):
+        if self.base is None:
+            return
+        self.canvas.delete('raster')
+        r0, r1, c0, c1 = self.visible_cells()
+        view = np.where(self.overlay_mask[r0:r1, c0:c1, None], self.overlay[r0:r1, c0:c1], self.base[r0:r1, c0:c1])
+        view = view.copy()
+        for (j, i), color in self.agents.values():
+            if r0 <= j < r1 and c0 <= i < c1:
+                view[j - r0, i - c0] = self.rgb(color)
+
+        if self.zoom >= 1:
+            scale = int(self.zoom)
+            view = view.repeat(scale, axis=0).repeat(scale, axis=1)
+            if self.zoom >= self.GRID_ZOOM:
+                view[::scale, :] = 0
+                view[:, ::scale] = 0
+        else:
+            # Several cells share one pixel, keep every n-th cell
+            step = int(round(1 / self.zoom))
+            view = view[::step, ::step]
+        view = view[:self.height, :self.width]
+
+        self.photo = ImageTk.PhotoImage(Image.fromarray(view, 'RGB'))
+        x0, y0, _, _ = self.cell_box(r0, c0)
+        self.canvas.create_image(x0, y0, image=self.photo, anchor='nw', tags='raster')
+        self.canvas.tag_lower('raster')
+
+        # Level of detail: labels are only readable when cells are big enough
+        if self.zoom >= self.LABEL_ZOOM:
+            maze = self.visualizer.maze
+            font_size = min(14, int(self.zoom / 3))
+            for j in range(r0, r1):
+                for i in range(c0, c1):
+                    x0, y0, x1, y1 = self.cell_box(j, i)
+                    if x0 < self.width and y0 < self.height:
+                        self.canvas.create_text((x0 + x1) / 2, (y0 + y1) / 2, text=maze[j][i], font=('Cascadia Code', font_size), tags='raster')
+
+    def pan(self, d_row, d_col):
+        rows, cols = self.base.shape[:2]
+        self.row = min(max(self.row + d_row, 0), max(rows - self.height / self.zoom, 0))
+        self.col = min(max(self.col + d_col, 0), max(cols - self.width / self.zoom, 0))
+        self.render()
+
+    def zoom_at(self, x, y, factor):
+        if self.base is None or x > self.width or y > self.height:
+            return
+        zoom = min(max(self.zoom * factor, self.MIN_ZOOM), self.MAX_ZOOM)
+        # Keep the cell under the cursor in place
+        row = self.row + y / self.zoom - y / zoom
+        col = self.col + x / self.zoom - x / zoom
+        self.zoom = zoom
+        self.row, self.col = row, col
+        self.pan(0, 0)
+
+    def start_drag(self, event):
+        self.drag_from = (event.x, event.y)
+
+    def drag(self, event):
+        if self.drag_from is None or self.base is None:
+            return
+        dx, dy = event.x - self.drag_from[0], event.y - self.drag_from[1]
+        self.drag_from = (event.x, event.y)
+        self.pan(-dy / self.zoom, -dx / self.zoom)
@@ -0,0 +1,210 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import AsyncPlanner
+import MazeContext
+import SearchBudget
+import level4
+
+# Local route service: JSON over HTTP for scripts that used to import the solvers and reload the map per query.
+# Maps are loaded once through MazeContext.load and stay warm with their distance fields and caches. Identical
+# requests arriving while one is being answered share its answer. GET /stats gives per-endpoint latencies.
+#
+#   POST /route        {"map": "input1_level1.txt", "finder": "AStarPathFinder", "start": [0, 0], "goal": [5, 5]}
+#   POST /fuel-route   {"map": "input1_level3.txt"}
+#   POST /agents       {"map": "input1_level4.txt"}
+#
+# start, goal, time_limit and fuel_capacity default to the ones in the map file. "budget" limits the search to
+# that many seconds, DEFAULT_BUDGET when left out and never more than MAX_BUDGET. Answers are
+# {"status": ..., "path": [...]}, malformed requests get a 400 with {"error": ...}.
+
+HOST = '127.0.0.1'
+PORT = 8765
+DEFAULT_BUDGET = 5.0  # Seconds
+MAX_BUDGET = 30.0
+MAX_SOLVES = 4  # Searches running at once, the other requests wait their turn
+ROUTE_FINDERS = ['BFSPathFinder', 'DFSPathFinder', 'UCSPathFinder', 'GBFSPathFinder', 'AStarPathFinder',
+                 'IDAStarPathFinder', 'PathFinderLevel2']
+
+class RequestError(Exception):
+    pass
+
+class LatencyHistogram:
+    BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)  # The last bucket is everything slower
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        bucket = next((index for index, bound in enumerate(self.BOUNDS_MS) if ms <= bound), len(self.BOUNDS_MS))
+        with self.lock:
+            self.counts[bucket] += 1
+            self.total += ms
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            labels = [f'<={bound}ms' for bound in self.BOUNDS_MS] + [f'>{self.BOUNDS_MS[-1]}ms']
+            return {'count': self.count,
+                    'mean_ms': self.total / self.count if self.count else 0,
+                    'buckets': dict(zip(labels, self.counts))}
+
+class RouteService:
+    def __init__(self, map_dir='.'):
+        self.map_dir = os.path.abspath(map_dir)
+        self.in_flight = {}  # request key -> Future of the answer
+        self.lock = threading.Lock()
+        # The warm caches lock themselves, this only keeps a burst of requests from starting every search at once
+        self.solves = threading.BoundedSemaphore(MAX_SOLVES)
+        self.histograms = {}
+        self.coalesced = 0
+
+    def load_map(self, name) -> MazeContext.MazeContext:
+        # Only files inside map_dir can be loaded
+        path = os.path.abspath(os.path.join(self.map_dir, str(name)))
+        if os.path.dirname(path) != self.map_dir or not os.path.isfile(path):
+            raise RequestError(f'unknown map {name!r}')
+        return MazeContext.load(path)
+
+    @staticmethod
+    def cell(context, value, default):
+        if value is None:
+            return default
+        if not (isinstance(value, list) and len(value) == 2 and all(type(part) is int for part in value)):
+            raise RequestError(f'a cell is [row, column], got {value!r}')
+        if not (0 <= value[0] < context.rows and 0 <= value[1] < context.cols):
+            raise RequestError(f'{value!r} is outside the {context.rows}x{context.cols} map')
+        return tuple(value)
+
+    @staticmethod
+    def number(request, name, default, kind=(int, float)):
+        # A non-negative number, bools aren't accepted although they are ints
+        value = request.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, kind) or value < 0:
+            raise RequestError(f'{name} has to be a non-negative {"integer" if kind is int else "number"}, got {value!r}')
+        return value
+
+    def budget(self, request) -> SearchBudget.SearchBudget:
+        return SearchBudget.SearchBudget(min(self.number(request, 'budget', DEFAULT_BUDGET), MAX_BUDGET))
+
+    def route(self, request):
+        context = self.load_map(request.get('map'))
+        finder = request.get('finder', 'AStarPathFinder')
+        if finder not in ROUTE_FINDERS:
+            raise RequestError(f'unknown finder {finder!r}')
+        start = self.cell(context, request.get('start'), context.starts[0])
+        goal = self.cell(context, request.get('goal'), context.goals[0])
+        time_limit = self.number(request, 'time_limit', context.time_limit)
+        return AsyncPlanner.plan_route(finder, context.maze, start, goal, time_limit, self.budget(request))
+
+    def fuel_route(self, request):
+        context = self.load_map(request.get('map'))
+        start = self.cell(context, request.get('start'), context.starts[0])
+        goal = self.cell(context, request.get('goal'), context.goals[0])
+        time_limit = self.number(request, 'time_limit', context.time_limit)
+        fuel_capacity = self.number(request, 'fuel_capacity', context.fuel_capacity, int)
+        return AsyncPlanner.plan_fuel_route(start, goal, time_limit, fuel_capacity, context.maze, self.budget(request))
+
+    def agents(self, request):
+        context = self.load_map(request.get('map'))
+        fuel_capacity = self.number(request, 'fuel_capacity', context.fuel_capacity, int)
+        agents = [level4.Agent(start, goal, fuel_capacity, context.time_limit, is_main=index == 0, name='S' if index == 0 else f'S{index}')
+                  for index, (start, goal) in enumerate(zip(context.starts, context.goals))]
+        return AsyncPlanner.plan_agents(agents, context.maze, fuel_capacity, self.budget(request))
+
+    ENDPOINTS = {'/route': route, '/fuel-route': fuel_route, '/agents': agents}
+
+    def answer(self, endpoint, request) -> dict:
+        # The first of several identical requests runs the search, the others wait for its answer
+        key = endpoint + json.dumps(request, sort_keys=True)
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if owner:
+            try:
+                with self.solves:
+                    path, budget = self.ENDPOINTS[endpoint](self, request)
+                future.set_result({'status': budget.status, 'path': path})
+            except Exception as error:
+                future.set_exception(error)
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+        return future.result()
+
+    def histogram(self, endpoint) -> LatencyHistogram:
+        with self.lock:
+            if endpoint not in self.histograms:
+                self.histograms[endpoint] = LatencyHistogram()
+            return self.histograms[endpoint]
+
+    def stats(self) -> dict:
+        with self.lock:
+            histograms = dict(self.histograms)
+        return {'coalesced': self.coalesced, 'maps': sorted(MazeContext.files),
+                'latency': {endpoint: histogram.snapshot() for endpoint, histogram in histograms.items()}}
+
+class RouteHandler(BaseHTTPRequestHandler):
+    service: RouteService = None  # Set by make_server
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, self.service.stats())
+        elif self.path == '/health':
+            self.send_json(200, {'ok': True})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path not in RouteService.ENDPOINTS:
+            self.send_json(404, {'error': 'not found'})
+            return
+        started = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not isinstance(request, dict):
+                raise RequestError('the body has to be a JSON object')
+            self.send_json(200, self.service.answer(self.path, request))
+        except (RequestError, ValueError) as error:
+            self.send_json(400, {'error': str(error)})
+        except Exception as error:
+            self.send_json(500, {'error': repr(error)})
+        finally:
+            self.service.histogram(self.path).record(time.perf_counter() - started)
+
+    def log_message(self, format, *args):
+        pass  # One line per query would drown the console
+
+def make_server(host=HOST, port=PORT, map_dir='.'):
+    handler = type('Handler', (RouteHandler,), {'service': RouteService(map_dir)})
+    return ThreadingHTTPServer((host, port), handler)
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    server = make_server(port=port, map_dir=os.path.dirname(os.path.abspath(__file__)))
+    print(f'Route server on http://{HOST}:{port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,71 @@
+import threading
+import time
+
+# Compute limits for the searches.
+# Unlike PathFinder.set_time_limit (delivery minutes on the map), a SearchBudget limits the wall-clock
+# time and the number of expanded states a solver may use. Solvers call expand() once per expanded state
+# and stop as soon as it returns False, then the budget holds the outcome and the best partial path.
+
+SOLVED = 'solved'
+INFEASIBLE = 'infeasible'
+BUDGET_EXHAUSTED = 'budget exhausted'
+CANCELLED = 'cancelled'
+
+class CancellationToken:
+    def __init__(self, event=None):
+        # A multiprocessing Event lets another process cancel
+        self.event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+class SearchBudget:
+    CHECK_EVERY = 64  # The clock and the token are only looked at every few expansions
+
+    def __init__(self, time_limit: float = None, max_expansions: int = None, token: CancellationToken = None, progress=None):
+        self.time_limit = time_limit  # Seconds
+        self.max_expansions = max_expansions
+        self.token = token
+        self.progress = progress  # Called with the expansion count every CHECK_EVERY expansions
+        self.start()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.deadline = None if self.time_limit is None else self.started + self.time_limit
+        self.expansions = 0
+        self.status = None
+        self.best_path = None  # The path when solved, the best partial path when stopped
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def expand(self) -> bool:
+        # Count one expansion, False once the search has to stop
+        if self.status in (BUDGET_EXHAUSTED, CANCELLED):
+            return False
+        self.expansions += 1
+        if self.max_expansions is not None and self.expansions > self.max_expansions:
+            self.status = BUDGET_EXHAUSTED
+            return False
+        if self.expansions % self.CHECK_EVERY == 1:
+            if self.progress is not None:
+                self.progress(self.expansions)
+            if self.token is not None and self.token.cancelled():
+                self.status = CANCELLED
+                return False
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                self.status = BUDGET_EXHAUSTED
+                return False
+        return True
+
+    def stopped(self) -> bool:
+        return self.status in (BUDGET_EXHAUSTED, CANCELLED)
+
+    def finish(self, status, best_path=None):
+        # Stopped searches keep the reason they were stopped for
+        if not self.stopped():
+            self.status = status
+        self.best_path = best_path
@@ -0,0 +1,110 @@
+from array import array
+
+# Compact bookkeeping for the searches over (cell, fuel, time) states of levels 3 and 4.
+# A state is packed into one int: the cell index in the lowest digits, the fuel above it and the time on top.
+# StateTable gives every state a slot the first time it is seen and keeps the packed state, the parent slot
+# and the path cost in flat arrays, instead of tuples of tuples in dictionaries.
+# Packed states are mapped to their slots by a dictionary. When the time is bounded and the search ends up
+# visiting a good share of the state space, the table moves to a flat array indexed by packed state, which
+# is smaller than the dictionary by then. Short queries never pay for allocating that array.
+
+class StateCodec:
+    def __init__(self, rows: int, cols: int, max_fuel: int):
+        self.cols = cols
+        self.cells = rows * cols
+        self.fuels = max_fuel + 1
+
+    def pack(self, cell, fuel: int, time: int) -> int:
+        return (time * self.fuels + fuel) * self.cells + cell[0] * self.cols + cell[1]
+
+    def cell(self, key: int):
+        return divmod(key % self.cells, self.cols)
+
+    def fuel(self, key: int) -> int:
+        return key // self.cells % self.fuels
+
+    def time(self, key: int) -> int:
+        return key // self.cells // self.fuels
+
+    def unpack(self, key: int):
+        rest, cell = divmod(key, self.cells)
+        time, fuel = divmod(rest, self.fuels)
+        return divmod(cell, self.cols), fuel, time
+
+    def size(self, max_time: int) -> int:
+        # Number of packed states with a time up to max_time
+        return (max_time + 1) * self.fuels * self.cells
+
+class StateTable:
+    NO_PARENT = -1
+    DENSE_LIMIT = 1 << 22  # Largest state space indexed by a flat array, 4 bytes per state
+    DENSE_SHARE = 32       # A dictionary entry costs about as much as 32 array entries
+
+    def __init__(self, codec: StateCodec, max_time: int = None):
+        self.codec = codec
+        self.index = {}  # packed state -> slot
+        self.slot = self.sparse_slot
+        self.dense_size = None
+        self.dense_after = None  # Number of states at which the flat array becomes the smaller index
+        if max_time is not None and codec.size(max_time) <= self.DENSE_LIMIT:
+            self.dense_size = codec.size(max_time)
+            self.dense_after = self.dense_size // self.DENSE_SHARE
+        self.keys = array('q')     # slot -> packed state
+        self.parents = array('i')  # slot -> parent slot
+        self.costs = array('q')    # slot -> cheapest path cost found so far
+        self.closed = bytearray()  # slot -> 1 once the state has been expanded
+
+    def __len__(self):
+        return len(self.keys)
+
+    def dense_slot(self, key: int) -> int:
+        return self.index[key]
+
+    def sparse_slot(self, key: int) -> int:
+        return self.index.get(key, self.NO_PARENT)
+
+    def make_dense(self):
+        index = array('i', [self.NO_PARENT]) * self.dense_size
+        for slot, key in enumerate(self.keys):
+            index[key] = slot
+        self.index = index
+        self.slot = self.dense_slot
+        self.dense_after = None
+
+    def add(self, key: int, parent: int, cost: int) -> int:
+        slot = len(self.keys)
+        if slot == self.dense_after:
+            self.make_dense()
+        self.index[key] = slot
+        self.keys.append(key)
+        self.parents.append(parent)
+        self.costs.append(cost)
+        self.closed.append(0)
+        return slot
+
+    def improve(self, key: int, parent: int, cost: int) -> int:
+        # Slot of the state when cost beats what is stored (adding it when new), NO_PARENT otherwise
+        slot = self.slot(key)
+        if slot == self.NO_PARENT:
+            return self.add(key, parent, cost)
+        if cost < self.costs[slot]:
+            self.parents[slot] = parent
+            self.costs[slot] = cost
+            return slot
+        return self.NO_PARENT
+
+    def close(self, slot: int) -> bool:
+        # Mark the state expanded, False when it already was
+        if self.closed[slot]:
+            return False
+        self.closed[slot] = 1
+        return True
+
+    def path(self, slot: int) -> list:
+        # Packed states from the root to slot
+        keys = []
+        while slot != self.NO_PARENT:
+            keys.append(self.keys[slot])
+            slot = self.parents[slot]
+        keys.reverse()
+        return keys
@@ -1,16 +1,36 @@
+import queue
+import sys
 import time
-import hupper
-import pyglet
 from tkinter import *
 from tkinter import ttk
-from ctypes import windll
-from PIL import Image, ImageTk
 
-# Make texts sharper
-windll.shcore.SetProcessDpiAwareness(1)
+import CompactPath
 
-# Add font file
-pyglet.font.add_file('CascadiaCode.ttf')
+# PIL is imported by load_gui() when the first window is created
+Image = None
+ImageTk = None
+
+def load_gui():
+    global Image, ImageTk
+    if Image is not None:
+        return
+    from PIL import Image as pil_image, ImageTk as pil_image_tk
+    Image, ImageTk = pil_image, pil_image_tk
+
+    # Make texts sharper, only Windows has this setting
+    if sys.platform == 'win32':
+        try:
+            from ctypes import windll
+            windll.shcore.SetProcessDpiAwareness(1)
+        except (ImportError, AttributeError, OSError):
+            pass
+
+    # Add font file, Tk falls back to a default font without pyglet
+    try:
+        import pyglet
+        pyglet.font.add_file('CascadiaCode.ttf')
+    except Exception:
+        pass
 
 
 move = True
@@ -18,6 +38,8 @@ move = True
 class Visualizer:
     # Declare all attributes, CONSTs, variables
     def __init__(self, map: list = None, init_func = None) -> None:
+        load_gui()
+        
         if map is None:
             self.maze = []
         else:
@@ -25,6 +47,8 @@ class Visualizer:
         
         self.BOX_WIDTH = 50
         self.PAD = 3
+        self.LARGE_MAP_CELLS = 1600  # Bigger maps are drawn by RasterView instead of one box per cell
+        self.raster = None
         
         self.colors = {
             "0": '#fff',
@@ -45,169 +69,187 @@ class Visualizer:
         
         self.make_boxes()
         self.canvas.pack()
-        self.images = []
+        self.sprites = {}  # (fill, width, height, alpha) -> PhotoImage shared by every rectangle
         self.agents = {}
+        self.player = None
+        self.player_bindings = []  # (sequence, funcid) of the keys bound to the player
+        self.animator = None
+        self.frame_id = None  # Pending root.after of an animation a level drives itself, e.g. level 3's path
+        self.POLL_MS = 50
+        self.plan_handlers = {}  # (planner, plan_id) -> (on_done, on_progress)
+        self.poll_id = None
 
         pass
     
     def set_map(self, map: list):
         self.maze = map
+        if map and len(map) * len(map[0]) > self.LARGE_MAP_CELLS:
+            if self.raster is None:
+                import RasterView
+                self.raster = RasterView.RasterView(self)
+            self.raster.set_map(map)
+        else:
+            self.close_raster()
+
+    def close_raster(self):
+        if self.raster is not None:
+            self.raster.close()
+            self.raster = None
     
     def draw_screen(self):
         self.canvas.pack()
         self.root.update()
+    
+    def cell_box(self, j, i):
+        if self.raster is not None:
+            return self.raster.cell_box(j, i)
+        x0 = i*self.BOX_WIDTH + self.PAD
+        y0 = j*self.BOX_WIDTH + self.PAD
+        return x0, y0, x0 + self.BOX_WIDTH, y0 + self.BOX_WIDTH
+    
+    def panel_x(self):
+        # Left edge of the text panel next to the map
+        if self.raster is not None:
+            return self.raster.width + 20
+        return len(self.maze[0]) * 50 + 20
+    
+    def draw_caption(self, lvl_name = None, headline = None, result = None, more_text = None):
+        lef_padding = self.panel_x()
+        if lvl_name is not None:
+            self.canvas.create_text(lef_padding, 12, text=lvl_name, font=('Cascadia Code', 14, 'bold'), anchor='nw')
+        if headline is not None:
+            self.canvas.create_text(lef_padding, 40, text=headline, font=('Cascadia Code', 14), anchor='nw')
+        if result is not None:
+            self.canvas.create_text(lef_padding, 68, text=result[0], font=('Cascadia Code', 14), anchor='nw', fill=result[1])
+        if more_text is not None:
+            self.canvas.create_text(lef_padding, 100, text=more_text, font=('Cascadia Code', 14), anchor='nw')
+    
+    def play_log(self, log, fps=30, max_duration=10):
+        self.stop_animations()
+        player = LogPlayer(self, log, fps, max_duration)
+        self.player_bindings = [
+            (sequence, self.root.bind(sequence, command)) for sequence, command in [
+                ("<Up>", lambda *args: player.faster()),
+                ("<Down>", lambda *args: player.slower()),
+                ("<Home>", lambda *args: player.seek(0)),
+                ("<End>", lambda *args: player.seek(len(log))),
+                ("<space>", lambda *args: player.toggle_pause()),
+            ]
+        ]
+        self.player = player
+        player.start()
+        return player
+    
+    def stop_animations(self):
+        if self.player is not None:
+            self.player.stop()
+            self.player = None
+        # The keys stop driving the old player, seeking would draw its log over whatever comes next
+        for sequence, funcid in self.player_bindings:
+            self.root.unbind(sequence, funcid)
+        self.player_bindings = []
+        if self.animator is not None:
+            self.animator.stop()
+            self.animator = None
+        if self.frame_id is not None:
+            self.root.after_cancel(self.frame_id)
+            self.frame_id = None
         
     def create_transparent_rectangle(self, x1, y1, x2, y2, **kwargs):
         transparent_image = None
         if 'alpha' in kwargs:
             alpha = int(kwargs.pop('alpha') * 255)
             fill = kwargs.pop('fill')
-            fill = self.root.winfo_rgb(fill) + (alpha,)
-            new_col = (int(fill[0]/65535*255),int(fill[1]/65535*255),int(fill[2]/65535*255),alpha)
-            image = Image.new('RGBA', (x2-x1, y2-y1), new_col)
-            self.images.append(ImageTk.PhotoImage(image))
-            transparent_image = self.canvas.create_image(x1, y1, image=self.images[-1], anchor='nw')
+            transparent_image = self.canvas.create_image(x1, y1, image=self.get_sprite(fill, x2-x1, y2-y1, alpha), anchor='nw')
         if transparent_image is not None:
             return (self.canvas.create_rectangle(x1, y1, x2, y2, **kwargs), transparent_image)
-            return transparent_image
         return self.canvas.create_rectangle(x1, y1, x2, y2, **kwargs)
     
+    def get_sprite(self, fill, width, height, alpha):
+        # Rectangles with the same look reuse one PhotoImage instead of creating a new one each call
+        key = (fill, width, height, alpha)
+        if key not in self.sprites:
+            fill = self.root.winfo_rgb(fill)
+            new_col = (int(fill[0]/65535*255),int(fill[1]/65535*255),int(fill[2]/65535*255),alpha)
+            image = Image.new('RGBA', (width, height), new_col)
+            self.sprites[key] = ImageTk.PhotoImage(image)
+        return self.sprites[key]
+    
+    def release_sprites(self):
+        # Only call once the canvas items using the sprites are gone
+        self.sprites.clear()
+    
+    def live_images(self):
+        return len(self.sprites)
+    
+    def reset_canvas(self):
+        # Tear down whatever the current level has drawn
+        self.cancel_plans()
+        self.stop_animations()
+        self.canvas.delete('all')
+        self.close_raster()
+        self.agents.clear()
+        self.release_sprites()
+    
+    # Background planning, results of an AsyncPlanner are picked up from its event queue with root.after
+    def watch_plan(self, planner, plan_id, on_done, on_progress=None):
+        self.plan_handlers[(planner, plan_id)] = (on_done, on_progress)
+        if self.poll_id is None:
+            self.poll_id = self.root.after(self.POLL_MS, self.poll_plans)
+    
+    def poll_plans(self):
+        self.poll_id = None
+        for planner in {planner for planner, _ in self.plan_handlers}:
+            while True:
+                try:
+                    plan_id, kind, payload = planner.events.get_nowait()
+                except queue.Empty:
+                    break
+                handlers = self.plan_handlers.get((planner, plan_id))
+                if handlers is None:
+                    continue  # Nobody is waiting for this plan any more
+                on_done, on_progress = handlers
+                if kind == 'progress':
+                    if on_progress is not None:
+                        on_progress(payload)
+                elif kind in ('done', 'failed'):
+                    del self.plan_handlers[(planner, plan_id)]
+                    on_done(kind, payload)
+        if self.plan_handlers and self.poll_id is None:
+            self.poll_id = self.root.after(self.POLL_MS, self.poll_plans)
+    
+    def cancel_plans(self):
+        for planner, plan_id in self.plan_handlers:
+            planner.cancel(plan_id)
+        self.plan_handlers.clear()
+    
     def next(self):
-        self.move = not self.move
+        if self.animator is not None:
+            self.animator.next()
     
     def toggle_autoplay(self):
-        if self.autoplay == False:
-            self.move = True
-        self.autoplay = not self.autoplay
+        if self.animator is not None:
+            self.animator.toggle_autoplay()
     
-    def draw_path_turn_based(self, path: list):
-        agent_colrs = {
-            'S' : '#10e305',
-            'S1': '#9b08e4',
-            'S2': '#a4ef04',
-            'S3': '#f71c03',
-            'S4': '#036af9',
-            'S5': '#f6ba05',
-            'S6': '#04faa4',
-            'S7': '#02c4e7',
-            'S8': '#f98202'
-        }
-        colrs = {
-            'S': 'red',
-            'S1': 'blue',
-            'S2': 'green',
-            'S3': 'purple',
-            'S4': 'dark orange',
-            'S5': 'maroon3',
-            'S6': 'gray38',
-            'S7': 'darkcyan',
-            'S8': 'dark slate gray',
-            'S9': 'sienna',
-        }
+    def draw_path_turn_based(self, path):
+        # path is a plan (a list of steps or a CompactPlan) or the file a plan was saved to with CompactPath.save_plan
+        if isinstance(path, str):
+            path = CompactPath.load_plan(path)
+        self.stop_animations()
         
-        lef_padding = len(self.maze[0]) * 50 + 20
+        lef_padding = self.panel_x()
         self.canvas.create_text(lef_padding, 12, text='Level 4: Multi agents', font=('Cascadia Code', 14, 'bold'), anchor='nw')
-        txt = self.canvas.create_text(lef_padding, 40, text='Step', font=('Cascadia Code', 14), anchor='nw')
-        self.canvas.create_text(lef_padding, 120, text='<Arrow ▶> for next move\n<Space ␣> for autoplay', font=('Cascadia Code', 14), anchor='nw')
-        
-        self.move = True
-        self.autoplay = False
+        self.canvas.create_text(lef_padding, 40, text='<Arrow ▶> for next move\n<Space ␣> for autoplay', font=('Cascadia Code', 14), anchor='nw')
+        status = self.canvas.create_text(lef_padding, 100, text='', font=('Cascadia Code', 14), anchor='nw', fill='green')
+        txt = self.canvas.create_text(lef_padding, 140, text='Step', font=('Cascadia Code', 14), anchor='nw')
         
         self.root.bind("<space>", lambda *args: self.toggle_autoplay())
         self.root.bind("<Right>", lambda *args: self.next())
         
         self.agents.clear()
-        
-        for step in path:
-            # Position for current node
-            j, i = step[2]
-            x0 = i*self.BOX_WIDTH + self.PAD
-            y0 = j*self.BOX_WIDTH + self.PAD
-            x1 = (i + 1)*self.BOX_WIDTH + self.PAD
-            y1 = (j + 1)*self.BOX_WIDTH + self.PAD
-            
-            # Position for placing previouse outline
-            before_j, before_i = step[1]
-            before_x0 = before_i*self.BOX_WIDTH + self.PAD
-            before_y0 = before_j*self.BOX_WIDTH + self.PAD
-            before_x1 = (before_i + 1)*self.BOX_WIDTH + self.PAD
-            before_y1 = (before_j + 1)*self.BOX_WIDTH + self.PAD
-            
-            self.canvas.itemconfigure(txt, text = f"Turn: {step[0]} - {step[3]}\n\
-From {step[1][0], step[1][1]} to {step[2][0], step[2][1]}")
-
-            curren_box = None
-            if step[0] not in self.agents:
-                if 'newgoal' in step[3]:
-                    curren_box = self.create_transparent_rectangle(x0, y0, x1, y1, fill=colrs[step[0]], width=1, alpha=1)
-                else:
-                    curren_box = self.create_transparent_rectangle(x0, y0, x1, y1, fill=colrs[step[0]], width=1, alpha=1)
-                self.agents[step[0]] = curren_box
-            else:
-                curren_box = self.agents[step[0]]
-                self.canvas.moveto(curren_box[0], x0, y0)
-                self.canvas.moveto(curren_box[1], x0, y0)
-
-            outline = self.canvas.create_rectangle(before_x0, before_y0, before_x1, before_y1, outline=colrs[step[0]], width=3)
-                
-            # Create text on current cell
-            current_cell_txt = None
-            if 'newgoal' in step[3]:
-                new_goal_cell = self.canvas.create_rectangle(x0, y0, x1, y1, fill=self.colors['G'])
-                self.canvas.tag_lower(new_goal_cell)
-                self.canvas.create_text(x0 + self.BOX_WIDTH/2, y0 + self.BOX_WIDTH/2, text='G' + step[0][1], font=('Cascadia Code', 12))
-            else:
-                if 'wait' in step[3]:
-                    current_cell_txt = self.canvas.create_text(x0 + self.BOX_WIDTH/2, y0 + self.BOX_WIDTH/2, text=step[0] + '⌛', font=('Cascadia Code', 12))
-                elif 'refuel' in step[3]:
-                    current_cell_txt = self.canvas.create_text(x0 + self.BOX_WIDTH/2, y0 + self.BOX_WIDTH/2, text=step[0] + '⛽', font=('Cascadia Code', 12))
-                else:
-                    current_cell_txt = self.canvas.create_text(x0 + self.BOX_WIDTH/2, y0 + self.BOX_WIDTH/2, text=step[0], font=('Cascadia Code', 12))
-                self.canvas.tag_raise(curren_box[0])
-                self.canvas.tag_raise(curren_box[1])
-                self.canvas.tag_raise(current_cell_txt)
-            
-            # If the action is to create new goal, move the outline to the correct position immediately
-            if 'newgoal' in step[3]:
-                self.canvas.move(outline, x0 - before_x0, y0 - before_y0)
-            
-            # Outline animation
-            self.canvas.moveto(curren_box[0], before_x0, before_y0)
-            self.canvas.moveto(curren_box[1], before_x0, before_y0)
-            # self.canvas.moveto(current_cell_txt, before_x0 + self.BOX_WIDTH/2 - 6, before_y0 + self.BOX_WIDTH/2 - 6)
-            # self.canvas.configure(current_cell_txt, x1=before_x0 + self.BOX_WIDTH/2, y1=before_y0 + self.BOX_WIDTH/2)
-            while (self.canvas.coords(outline)[0] != x0 or self.canvas.coords(outline)[1] != y0):
-                x_amount = 1 if x0 > self.canvas.coords(outline)[0] else -1 if x0 < self.canvas.coords(outline)[0] else 0
-                y_amount = 1 if y0 > self.canvas.coords(outline)[1] else -1 if y0 < self.canvas.coords(outline)[1] else 0
-                self.canvas.move(outline, x_amount, y_amount)
-                self.canvas.move(curren_box[0], x_amount, y_amount)
-                self.canvas.move(curren_box[1], x_amount, y_amount)
-                # self.canvas.move(current_cell_txt, x_amount, y_amount)
-                self.canvas.after(1)
-                self.root.update()
-            
-            self.draw_screen()
-            self.move = False
-                
-            # Auto play feature
-            if self.autoplay:
-                self.root.after(0)
-                if current_cell_txt is not None:
-                    self.canvas.delete(current_cell_txt)
-                self.canvas.delete(outline)
-                continue
-            
-            # Pause the screen waiting for user input for next move
-            while not self.move:
-                self.root.update()
-                
-            # Remove outline and text in preparation for next move
-            if current_cell_txt is not None:
-                self.canvas.delete(current_cell_txt)
-            self.canvas.delete(outline)
-            
-        self.canvas.create_text(lef_padding, 180, text='Main agent has reached the goal', font=('Cascadia Code', 14), anchor='nw', fill='green')
-        
+        self.animator = PathAnimator(self, path, txt, status)
+        self.animator.start()
+        return self.animator
     
     def add_point(self, start, txt):
         print(start[0])
@@ -218,6 +260,10 @@ From {step[1][0], step[1][1]} to {step[2][0], step[2][1]}")
         print('--')
     
     def update_frontier(self, frontier: list):
+        if self.raster is not None:
+            self.raster.paint(frontier, '#e4f6d4')
+            self.raster.render()
+            return
         for j, i in frontier:
             x0 = i*self.BOX_WIDTH + self.PAD
             y0 = j*self.BOX_WIDTH + self.PAD
@@ -230,6 +276,10 @@ From {step[1][0], step[1][1]} to {step[2][0], step[2][1]}")
     def update_path(self, path: list):
         self.make_boxes()
         
+        if self.raster is not None:
+            self.raster.paint(path, '#e4f6d4')
+            self.raster.render()
+            return
         for j, i in path:
             x0 = i*self.BOX_WIDTH + self.PAD
             y0 = j*self.BOX_WIDTH + self.PAD
@@ -240,6 +290,10 @@ From {step[1][0], step[1][1]} to {step[2][0], step[2][1]}")
             self.canvas.create_text(x0 + self.BOX_WIDTH/2, y0 + self.BOX_WIDTH/2, text=self.maze[j][i], font=('Cascadia Code', 14))
             
     def update_current(self, current):
+        if self.raster is not None:
+            self.raster.paint([current], '#f8cecc')
+            self.raster.render()
+            return
         j, i = current
         x0 = i*self.BOX_WIDTH + self.PAD
         y0 = j*self.BOX_WIDTH + self.PAD
@@ -251,6 +305,10 @@ From {step[1][0], step[1][1]} to {step[2][0], step[2][1]}")
         pass
 
     def make_boxes(self):
+        if self.raster is not None:
+            self.raster.clear_overlay()
+            self.raster.render()
+            return
         for j, _ in enumerate(self.maze):
             for i, _ in enumerate(self.maze[0]):
                 x0 = i*self.BOX_WIDTH + self.PAD
@@ -266,6 +324,298 @@ From {step[1][0], step[1][1]} to {step[2][0], step[2][1]}")
                     self.canvas.create_rectangle(x0, y0, x1, y1, fill='#dae8fc', width=1)
                     self.canvas.create_text(x0 + self.BOX_WIDTH/2, y0 + self.BOX_WIDTH/2, text=self.maze[j][i], font=('Cascadia Code', 14))
 
+
+# Animates a level 4 plan from the Tk event loop. Steps are grouped into time steps so every
+# agent of a step slides at once, positions are tweened by elapsed time and nothing runs while
+# waiting for the user to press the next move
+class PathAnimator:
+    MOVE_MS = 200
+    FRAME_MS = 16
+    COLORS = {
+        'S': 'red',
+        'S1': 'blue',
+        'S2': 'green',
+        'S3': 'purple',
+        'S4': 'dark orange',
+        'S5': 'maroon3',
+        'S6': 'gray38',
+        'S7': 'darkcyan',
+        'S8': 'dark slate gray',
+        'S9': 'sienna',
+    }
+
+    def __init__(self, visualizer: Visualizer, path: list, txt, status):
+        self.visualizer = visualizer
+        self.canvas = visualizer.canvas
+        self.agents = visualizer.agents
+        self.groups = self.group_time_steps(path)
+        self.txt = txt
+        self.status = status
+        self.index = 0
+        self.autoplay = False
+        self.waiting = False  # Finished a time step and waiting for the user
+        self.pending = False  # Next move was requested while a time step was still moving
+        self.after_id = None
+        self.movers = []
+        self.leftovers = []  # Outlines and texts removed when the next time step starts
+        self.started_at = 0
+
+    @staticmethod
+    def group_time_steps(path):
+        # Merged plans list one step per agent per time step, a repeated agent starts the next step
+        groups = []
+        names = set()
+        for step in path:
+            if not groups or step[0] in names:
+                groups.append([])
+                names.clear()
+            groups[-1].append(step)
+            names.add(step[0])
+        return groups
+
+    def start(self):
+        self.play_group()
+
+    def stop(self):
+        if self.after_id is not None:
+            self.visualizer.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def next(self):
+        if self.waiting:
+            self.waiting = False
+            self.play_group()
+        else:
+            self.pending = True
+
+    def toggle_autoplay(self):
+        self.autoplay = not self.autoplay
+        if self.autoplay and self.waiting:
+            self.next()
+
+    def play_group(self):
+        for item in self.leftovers:
+            self.canvas.delete(item)
+        self.leftovers.clear()
+        self.movers.clear()
+        
+        if self.index >= len(self.groups):
+            self.canvas.itemconfigure(self.status, text='Main agent has reached the goal')
+            return
+        
+        group = self.groups[self.index]
+        self.index += 1
+        self.canvas.itemconfigure(self.txt, text='\n'.join(f"{step[0]} - {step[3]}: {step[1][0], step[1][1]} to {step[2][0], step[2][1]}" for step in group))
+        for step in group:
+            self.prepare_step(step)
+        if self.visualizer.raster is not None:
+            self.visualizer.raster.render()
+        
+        self.started_at = time.perf_counter()
+        self.tween()
+
+    def prepare_step(self, step):
+        name, before, current, action = step
+        color = self.COLORS[name]
+        raster = self.visualizer.raster
+        if raster is not None:
+            # Large maps draw agents as an overlay layer and jump straight to the next cell
+            raster.set_agent(name, current, color)
+            if 'newgoal' in action:
+                raster.paint([current], self.visualizer.colors['G'])
+            return
+        x0, y0, x1, y1 = self.visualizer.cell_box(*current)
+        before_x0, before_y0, before_x1, before_y1 = self.visualizer.cell_box(*before)
+        
+        if name not in self.agents:
+            self.agents[name] = self.visualizer.create_transparent_rectangle(x0, y0, x1, y1, fill=color, width=1, alpha=1)
+        box = self.agents[name]
+        
+        outline = self.canvas.create_rectangle(before_x0, before_y0, before_x1, before_y1, outline=color, width=3)
+        self.leftovers.append(outline)
+        
+        # Create text on current cell
+        if 'newgoal' in action:
+            new_goal_cell = self.canvas.create_rectangle(x0, y0, x1, y1, fill=self.visualizer.colors['G'])
+            self.canvas.tag_lower(new_goal_cell)
+            self.canvas.create_text(x0 + self.visualizer.BOX_WIDTH/2, y0 + self.visualizer.BOX_WIDTH/2, text='G' + name[1], font=('Cascadia Code', 12))
+            # The outline jumps to the new goal while the agent stays where it is
+            self.canvas.move(outline, x0 - before_x0, y0 - before_y0)
+            self.canvas.moveto(box[0], before_x0, before_y0)
+            self.canvas.moveto(box[1], before_x0, before_y0)
+            return
+        
+        if 'wait' in action:
+            label = name + '⌛'
+        elif 'refuel' in action:
+            label = name + '⛽'
+        else:
+            label = name
+        current_cell_txt = self.canvas.create_text(x0 + self.visualizer.BOX_WIDTH/2, y0 + self.visualizer.BOX_WIDTH/2, text=label, font=('Cascadia Code', 12))
+        self.leftovers.append(current_cell_txt)
+        self.canvas.tag_raise(box[0])
+        self.canvas.tag_raise(box[1])
+        self.canvas.tag_raise(current_cell_txt)
+        
+        # The agent slides from the previous cell, starting where the outline was drawn
+        self.canvas.moveto(box[0], before_x0, before_y0)
+        self.canvas.moveto(box[1], before_x0, before_y0)
+        self.movers.append([(outline,) + tuple(box), before_x0, before_y0, x0, y0, before_x0, before_y0])
+
+    def tween(self):
+        self.after_id = None
+        progress = min((time.perf_counter() - self.started_at) * 1000 / self.MOVE_MS, 1)
+        for mover in self.movers:
+            items, from_x, from_y, to_x, to_y, last_x, last_y = mover
+            x = round(from_x + (to_x - from_x) * progress)
+            y = round(from_y + (to_y - from_y) * progress)
+            for item in items:
+                self.canvas.move(item, x - last_x, y - last_y)
+            mover[5], mover[6] = x, y
+        
+        if progress < 1:
+            self.after_id = self.visualizer.root.after(self.FRAME_MS, self.tween)
+        elif self.autoplay or self.pending:
+            self.pending = False
+            self.after_id = self.visualizer.root.after(0, self.play_group)
+        else:
+            # Nothing is scheduled until the user asks for the next move
+            self.waiting = True
+
+
+# Replays a recorded search log with root.after at a fixed frame rate.
+# When there are more events than frames, each frame applies a batch of events
+class LogPlayer:
+    BASE_RATE = 30  # Events per second for short logs, about the speed of the old live drawing
+    COLORS = {
+        0: '#e4f6d4',  # Frontier
+        1: '#fce5cd',  # Expanded
+        2: '#f8cecc',  # Path
+    }
+
+    def __init__(self, visualizer: Visualizer, log, fps=30, max_duration=10):
+        self.visualizer = visualizer
+        self.canvas = visualizer.canvas
+        self.log = log
+        self.fps = fps
+        # Long logs are squeezed into max_duration seconds by batching events into frames
+        self.rate = max(self.BASE_RATE, len(log) / max_duration)
+        self.speed = 1.0
+        self.position = 0
+        self.carry = 0.0
+        self.paused = False
+        self.after_id = None
+        self.state = {}  # cell -> strongest event kind seen so far
+        self.items = {}  # cell -> (rectangle, text) drawn over the map
+        self.current = None
+
+    def start(self):
+        self.draw_base()
+        self.schedule()
+
+    def draw_base(self):
+        self.canvas.delete('all')
+        self.visualizer.make_boxes()
+        self.visualizer.draw_caption(**self.log.caption)
+        self.canvas.create_text(self.visualizer.panel_x(), 160, text='<Arrow ▲ ▼> replay speed\n<Home/End> seek\n<Space ␣> pause', font=('Cascadia Code', 14), anchor='nw')
+
+    def stop(self):
+        if self.after_id is not None:
+            self.visualizer.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def schedule(self):
+        if self.after_id is None and not self.paused and self.position < len(self.log):
+            self.after_id = self.visualizer.root.after(int(1000 / self.fps), self.frame)
+
+    def frame(self):
+        self.after_id = None
+        self.carry += self.rate * self.speed / self.fps
+        count = int(self.carry)
+        self.carry -= count
+        if count > 0:
+            self.apply(self.position, min(self.position + count, len(self.log)))
+        if self.position >= len(self.log):
+            self.finish()
+            return
+        self.schedule()
+
+    def apply(self, begin, end):
+        changed = set()
+        current = None
+        for index in range(begin, end):
+            kind, cell = self.log[index]
+            if kind >= self.state.get(cell, -1):
+                self.state[cell] = kind
+                changed.add(cell)
+            if kind != self.log.FRONTIER:
+                current = cell
+        for cell in changed:
+            self.draw_cell(cell)
+        if changed and self.visualizer.raster is not None:
+            self.visualizer.raster.render()
+        if current is not None:
+            self.draw_current(current)
+        self.position = end
+
+    def draw_cell(self, cell):
+        color = self.COLORS[self.state[cell]]
+        if self.visualizer.raster is not None:
+            self.visualizer.raster.paint([cell], color)
+            return
+        if cell in self.items:
+            self.canvas.itemconfigure(self.items[cell][0], fill=color)
+            return
+        j, i = cell
+        x0, y0, x1, y1 = self.visualizer.cell_box(j, i)
+        rect = self.canvas.create_rectangle(x0, y0, x1, y1, fill=color, width=1, tags='replay')
+        text = self.canvas.create_text(x0 + self.visualizer.BOX_WIDTH/2, y0 + self.visualizer.BOX_WIDTH/2, text=self.visualizer.maze[j][i], font=('Cascadia Code', 14), tags='replay')
+        self.items[cell] = (rect, text)
+
+    def draw_current(self, cell):
+        x0, y0, x1, y1 = self.visualizer.cell_box(*cell)
+        if self.current is None:
+            self.current = self.canvas.create_rectangle(x0, y0, x1, y1, outline='#b85450', width=3)
+        else:
+            self.canvas.coords(self.current, x0, y0, x1, y1)
+        self.canvas.tag_raise(self.current)
+
+    def finish(self):
+        if self.current is not None:
+            self.canvas.delete(self.current)
+            self.current = None
+        self.visualizer.draw_caption(**(self.log.final_caption or self.log.caption))
+
+    def seek(self, index):
+        index = max(0, min(index, len(self.log)))
+        self.stop()
+        self.items.clear()
+        self.state.clear()
+        self.current = None
+        self.carry = 0.0
+        self.draw_base()
+        self.apply(0, index)
+        if self.position >= len(self.log):
+            self.finish()
+        else:
+            self.schedule()
+
+    def set_speed(self, speed):
+        self.speed = max(0.125, min(speed, 64))
+
+    def faster(self):
+        self.set_speed(self.speed * 2)
+
+    def slower(self):
+        self.set_speed(self.speed / 2)
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        if self.paused:
+            self.stop()
+        else:
+            self.schedule()
+
     
 def main():
     visuals = Visualizer()
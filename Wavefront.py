@@ -0,0 +1,81 @@
+import numpy as np
+
+# Breadth-first distances on unit-cost grids, computed for many sources at once.
+# Instead of one BFSPathFinder run per depot, every BFS layer is one set of array shifts over the open cells
+# (the cells ReadInput doesn't mark as -1). Distances are in moves, UNREACHABLE where a cell can't be reached.
+
+UNREACHABLE = -1
+
+def open_mask(maze) -> np.ndarray:
+    return np.asarray(maze) != -1
+
+def spread(frontier: np.ndarray) -> np.ndarray:
+    # Cells next to the frontier, the last two axes are the grid
+    result = np.zeros_like(frontier)
+    result[..., 1:, :] |= frontier[..., :-1, :]
+    result[..., :-1, :] |= frontier[..., 1:, :]
+    result[..., :, 1:] |= frontier[..., :, :-1]
+    result[..., :, :-1] |= frontier[..., :, 1:]
+    return result
+
+def source_layer(shape, sources, open_cells):
+    # One grid per source with only that source set, walls as sources never spread
+    layer = np.zeros((len(sources),) + shape, dtype=bool)
+    if len(sources):
+        rows, cols = np.array(sources).T
+        layer[np.arange(len(sources)), rows, cols] = True
+    return layer & open_cells
+
+def distance_tensor(maze, sources) -> np.ndarray:
+    """(sources x rows x cols) array, distance[k, x, y] is the number of moves from sources[k] to (x, y)."""
+    open_cells = open_mask(maze)
+    frontier = source_layer(open_cells.shape, sources, open_cells)
+    distance = np.full(frontier.shape, UNREACHABLE, dtype=np.int32)
+    visited = frontier.copy()
+    step = 0
+    while frontier.any():
+        distance[frontier] = step
+        step += 1
+        frontier = spread(frontier) & open_cells & ~visited
+        visited |= frontier
+    return distance
+
+def nearest_depot(maze, depots):
+    """Multi-source wavefront, returns (distance, label) grids: the moves to the closest depot and its index
+    in depots. Ties go to the lower index, label is UNREACHABLE where no depot can be reached."""
+    open_cells = open_mask(maze)
+    depots = list(depots)
+    distance = np.full(open_cells.shape, UNREACHABLE, dtype=np.int32)
+    label = np.full(open_cells.shape, UNREACHABLE, dtype=np.int32)
+    # Earlier depots win a cell that is listed twice, so they are written last
+    for index in range(len(depots) - 1, -1, -1):
+        x, y = depots[index]
+        if open_cells[x, y]:
+            distance[x, y] = 0
+            label[x, y] = index
+    frontier = label != UNREACHABLE
+    no_label = np.iinfo(np.int32).max
+    step = 0
+    while frontier.any():
+        step += 1
+        # Every new cell takes the smallest label among its neighbours on the frontier
+        frontier_label = np.where(frontier, label, no_label)
+        new_label = np.full(label.shape, no_label, dtype=np.int32)
+        new_label[1:, :] = np.minimum(new_label[1:, :], frontier_label[:-1, :])
+        new_label[:-1, :] = np.minimum(new_label[:-1, :], frontier_label[1:, :])
+        new_label[:, 1:] = np.minimum(new_label[:, 1:], frontier_label[:, :-1])
+        new_label[:, :-1] = np.minimum(new_label[:, :-1], frontier_label[:, 1:])
+        frontier = (new_label != no_label) & open_cells & (label == UNREACHABLE)
+        label[frontier] = new_label[frontier]
+        distance[frontier] = step
+    return distance, label
+
+def coverage(maze, depots, radius: int) -> np.ndarray:
+    # Cells at most radius moves away from any depot, one wavefront for all depots
+    distance, _ = nearest_depot(maze, depots)
+    return (distance != UNREACHABLE) & (distance <= radius)
+
+def coverage_counts(maze, depots, radius: int) -> np.ndarray:
+    # Number of depots within radius moves of every cell
+    distance = distance_tensor(maze, depots)
+    return ((distance != UNREACHABLE) & (distance <= radius)).sum(axis=0)
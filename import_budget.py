@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+# Worker processes only import the solvers, they have to start fast and without any GUI library
+BUDGET_MS = 50
+SOLVER_MODULES = ['ReadInput', 'PathFinder', 'level3', 'level4']
+GUI_MODULES = ['tkinter', 'PIL', 'pyglet', 'hupper', 'numpy', 'Visualizer']
+
+def measure(module, runs=5):
+    # A fresh interpreter per run so nothing is cached in sys.modules
+    code = f'''
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+print(elapsed, ','.join(m for m in {GUI_MODULES!r} if m in sys.modules))
+'''
+    best = None
+    loaded = ''
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()
+        elapsed = float(output[0])
+        loaded = output[1] if len(output) > 1 else ''
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded
+
+def main():
+    ok = True
+    for module in SOLVER_MODULES:
+        elapsed, loaded = measure(module)
+        status = 'ok'
+        if elapsed > BUDGET_MS:
+            status = 'over budget'
+            ok = False
+        if loaded:
+            status = 'imports GUI: ' + loaded
+            ok = False
+        print(f'{module:12s} {elapsed:7.2f} ms  {status}')
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
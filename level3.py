@@ -1,54 +1,70 @@
-import heapq
 import ReadInput
+import SearchBudget
+import MazeContext
+import DistanceField
+from BucketQueue import BucketQueue
+from StateTable import StateCodec, StateTable
 
-class PriorityQueue:
-    def __init__(self):
-        self.elements = []
-    
-    def empty(self):
-        return len(self.elements) == 0
-    
-    def put(self, priority, item):
-        heapq.heappush(self.elements, (priority, item))
-    
-    def get(self):
-        return heapq.heappop(self.elements)[1]
-    
-def a_star_fuel(start, goal, time_limit, fuel_capacity, maze):
-    frontier = PriorityQueue()
-    frontier.put(0 + heuristic(start, goal), (0, 0, fuel_capacity, start, []))
-    
-    reached = {}  # Dictionary to store the states with path cost, time, and fuel
-    reached[(start, 0, fuel_capacity)] = 0  # Store the initial state
+def a_star_fuel(start, goal, time_limit, fuel_capacity, maze, budget=None):
+    # States (cell, time, fuel) are packed into ints, the table keeps the path cost and parent of each one
+    codec = StateCodec(len(maze), len(maze[0]), fuel_capacity)
+    move_time = MazeContext.of(maze).time_table(enter_time)  # Same as time_to_move for the move a neighbour needs
+    # Exact lower bounds on the time to the goal and on the fuel needed to get anywhere useful. A state
+    # that can't beat them is dropped, and a query whose start can't is rejected before searching
+    time_needed = DistanceField.field_cache.get(maze, goal, enter_time)
+    fuel_needed = DistanceField.FuelField(maze, goal)
+    if time_needed[start] > time_limit or fuel_needed[start] > fuel_capacity:
+        if budget is not None:
+            budget.finish(SearchBudget.INFEASIBLE)
+        return None
+
+    states = StateTable(codec, time_limit)
+    frontier = BucketQueue()
+    frontier.put(0 + heuristic(start, goal), states.add(codec.pack(start, fuel_capacity, 0), StateTable.NO_PARENT, 0))
 
     while not frontier.empty():
-        path_cost, current_time, current_fuel, current, path = frontier.get()
-        path = path + [current]
+        priority, slot = frontier.pop()
+        current, current_fuel, current_time = codec.unpack(states.keys[slot])
+        path_cost = priority - heuristic(current, goal)
+        if path_cost > states.costs[slot]:
+            continue  # Stale entry
+        if budget is not None and not budget.expand():
+            closest = min([slot] + list(frontier), key=lambda slot: heuristic(codec.cell(states.keys[slot]), goal))
+            budget.finish(SearchBudget.BUDGET_EXHAUSTED, state_path(states, closest))
+            return None
 
         if current == goal:
+            path = state_path(states, slot)
+            if budget is not None:
+                budget.finish(SearchBudget.SOLVED, path)
             return path
 
         for next_state, new_fuel, action in get_neighbors_with_fuel(current, current_fuel, fuel_capacity, maze):
             new_cost = path_cost + cost_to_move()
-            new_time = current_time + time_to_move(next_state, action, maze)
+            new_time = current_time + move_time[next_state]
             if action == "move":
                 new_fuel = current_fuel - cost_to_move()
             elif action == "refuel":
                 new_fuel = fuel_capacity
                 
-            state = (next_state, new_time, new_fuel)
-            if new_time <= time_limit and new_fuel >= 0:
-                if state not in reached or new_cost < reached[state]:
-                    reached[state] = new_cost
+            if new_time + time_needed[next_state] <= time_limit and new_fuel >= fuel_needed[next_state]:
+                next_slot = states.improve(codec.pack(next_state, new_fuel, new_time), slot, new_cost)
+                if next_slot != StateTable.NO_PARENT:
                     priority = new_cost + heuristic(next_state, goal)
-                    frontier.put(priority, (new_cost, new_time, new_fuel, next_state, path))
+                    frontier.put(priority, next_slot, new_cost)
 
+    if budget is not None:
+        budget.finish(SearchBudget.INFEASIBLE)
     return None  # No path found within time limit
 
+def state_path(states, slot):
+    return [states.codec.cell(key) for key in states.path(slot)]
+
 def get_neighbors_with_fuel(current, fuel, fuel_capacity, maze):
+    context = MazeContext.of(maze)
     neighbors = []
-    for next in get_neighbors(current, maze):
-        if is_gas_station(next, maze):
+    for next in context.adjacency[current]:
+        if next in context.stations:
             neighbors.append((next, fuel_capacity, 'refuel'))
         else:
             neighbors.append((next, fuel - 1, 'move'))
@@ -56,14 +72,8 @@ def get_neighbors_with_fuel(current, fuel, fuel_capacity, maze):
     return neighbors
 
 def get_neighbors(current, maze):
-    neighbors = []
-    x, y = current
-    directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-    for dx, dy in directions:
-        nx, ny = x + dx, y + dy
-        if 0 <= nx < len(maze) and 0 <= ny < len(maze[0]) and maze[nx][ny] != -1:
-            neighbors.append((nx, ny))
-    return neighbors
+    # Worked out once per cell, don't change the returned list
+    return MazeContext.of(maze).adjacency[current]
 
 def cost_to_move():
     return 1  # Each move costs 1 fuel unit
@@ -78,6 +88,10 @@ def time_to_move(next, action, maze):
     elif action == 'refuel':
         return refuel_time(next, maze)
     
+def enter_time(node, maze):
+    # Time for stepping into a cell, refuelling included
+    return time_to_move(node, 'refuel' if is_gas_station(node, maze) else 'move', maze)
+
 def heuristic(node, goal):
     return manhattan_distance(node, goal)
 
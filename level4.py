@@ -1,19 +1,10 @@
-import heapq
 import random
-import numpy as np
 
-class PriorityQueue:
-    def __init__(self):
-        self.elements = []
-
-    def empty(self):
-        return len(self.elements) == 0
-
-    def put(self, item, priority):
-        heapq.heappush(self.elements, (priority, item))
-
-    def get(self):
-        return heapq.heappop(self.elements)[1]
+import SearchBudget
+import DistanceField
+import MazeContext
+from BucketQueue import BucketQueue
+from StateTable import StateCodec, StateTable
 
 class Agent:
     def __init__(self, start, goal, fuel, time_limit, is_main=False, name=None):
@@ -24,78 +15,88 @@ class Agent:
         self.is_main = is_main
         self.name = name
 
-def whca_star(agents, maze, fuel_capacity, window_size=5):
+class ReservationTable(dict):
+    # step -> the cells taken at that step and the (pos, next_pos) moves made during it, so that a later agent
+    # doesn't swap places with an earlier one. An agent stays on the last cell of its path once it is done,
+    # parked maps that cell to the first step it stands there for good
+    def __init__(self):
+        super().__init__()
+        self.parked = {}
+
+def whca_star(agents, maze, fuel_capacity, window_size=5, budget=None, low_level=None):
+    # low_level plans one agent against the reservation table, single_agent_whca or single_agent_sipp
+    if low_level is None:
+        low_level = single_agent_whca
     start_state = tuple((agent.start[0], agent.start[1], agent.fuel, 0) for agent in agents)
 
     # Initialize reservation table
-    reservation_table = {}
+    reservation_table = ReservationTable()
 
     paths = []
     for i, agent in enumerate(agents):
-        path = single_agent_whca(agent, i, maze, fuel_capacity, window_size, reservation_table)
+        path = low_level(agent, i, maze, fuel_capacity, window_size, reservation_table, budget)
         if path is None:
-            print(f"No path found for agent {agent.name}")
             return None
         paths.append(path)
 
-        # Update reservation table
+        # Update reservation table, the agent is on pos at step t and on next_pos at step t + 1
         for t, (_, pos, next_pos, _) in enumerate(path):
-            if t not in reservation_table:
-                reservation_table[t] = set()
+            for step in (t, t + 1):
+                if step not in reservation_table:
+                    reservation_table[step] = set()
             reservation_table[t].add(pos)
-            reservation_table[t].add(next_pos)
-
-    return merge_paths(paths)
-
-def single_agent_whca(agent, agent_index, maze, fuel_capacity, window_size, reservation_table):
-    start_state = (agent.start[0], agent.start[1], agent.fuel, 0)
-    frontier = PriorityQueue()
-    frontier.put(start_state, 0)
-    came_from = {start_state: None}
-    cost_so_far = {start_state: (0, 0, agent.fuel)}  # (cost, time, fuel)
+            reservation_table[t + 1].add(next_pos)
+            if next_pos != pos:
+                reservation_table[t].add((pos, next_pos))
+        reservation_table.parked[path[-1][2] if path else agent.start] = len(path)
+
+    merged_path = merge_paths(paths)
+    if budget is not None:
+        budget.finish(SearchBudget.SOLVED, merged_path)
+    return merged_path
 
-    best_path = None
-    best_cost = float('inf')
-    suboptimal_path = None
-    suboptimal_cost = float('inf')
+def single_agent_whca(agent, agent_index, maze, fuel_capacity, window_size, reservation_table, budget=None):
+    # States (x, y, fuel, time) are packed into ints, the table keeps the cost and parent of each one.
+    # Cost and time both grow by the move, the toll wait and the refuel time, so the cost doubles as the time
+    codec = StateCodec(len(maze), len(maze[0]), max(fuel_capacity, agent.fuel))
+    states = StateTable(codec)
+    start_slot = states.add(codec.pack(agent.start, agent.fuel, 0), StateTable.NO_PARENT, 0)
+    frontier = BucketQueue()
+    frontier.put(0, start_slot)
+    # Shared with every other agent and replan heading to the same goal
+    goal_distance = DistanceField.field_cache.get(maze, agent.goal, enter_time)
+    move_time = MazeContext.of(maze).time_table(enter_time)
 
     while not frontier.empty():
-        current_state = frontier.get()
-
-        if current_state[:2] == agent.goal:
-            path = reconstruct_single_path(came_from, start_state, current_state, agent, maze)
-            current_cost, current_time, _ = cost_so_far[current_state]
-            if current_time <= agent.time_limit:
-                if current_cost < suboptimal_cost:
-                    suboptimal_path = path
-                    suboptimal_cost = current_cost
-                if current_cost < best_cost:
-                    best_path = path
-                    best_cost = current_cost
-            elif current_cost < best_cost:
-                best_path = path
-                best_cost = current_cost
-
-        for next_state in get_single_agent_next_states(current_state, agent, maze, fuel_capacity, reservation_table):
-            current_cost, current_time, current_fuel = cost_so_far[current_state]
-            new_cost = current_cost + 1
-            new_time = current_time + 1
-            new_fuel = next_state[2]  # Fuel is already updated in get_single_agent_next_states
-
-            if is_toll_booth(next_state[:2], maze):
-                wait_time = toll_booth_wait_time(next_state[:2], maze)
-                new_cost += wait_time
-                new_time += wait_time
-            if is_gas_station(next_state[:2], maze):
-                refuel_duration = refuel_time(next_state[:2], maze)
-                new_cost += refuel_duration
-                new_time += refuel_duration
-
-            if new_cost < best_cost and (next_state not in cost_so_far or new_cost < cost_so_far[next_state][0]):
-                cost_so_far[next_state] = (new_cost, new_time, new_fuel)
-                priority = new_cost + manhattan_distance(next_state[:2], agent.goal)
-                frontier.put(next_state, priority)
-                came_from[next_state] = current_state
+        slot = frontier.get()
+        if not states.close(slot):
+            continue  # Stale entry, the state was already expanded with a lower cost
+        (x, y), fuel, time = codec.unpack(states.keys[slot])
+        if budget is not None and not budget.expand():
+            closest = min((closed_slot for closed_slot in range(len(states)) if states.closed[closed_slot]),
+                          key=lambda closed_slot: manhattan_distance(codec.cell(states.keys[closed_slot]), agent.goal))
+            budget.finish(SearchBudget.BUDGET_EXHAUSTED, reconstruct_single_path(state_path(states, closest), agent, maze))
+            return None
+
+        if (x, y) == agent.goal:
+            # The heuristic is consistent so the first goal expanded is the cheapest one, and as cost and time
+            # grow together it is also the earliest arrival. Nothing found later could be better
+            path = reconstruct_single_path(state_path(states, slot), agent, maze)
+            if budget is not None:
+                budget.finish(SearchBudget.SOLVED, path)
+            return path
+
+        current_cost = states.costs[slot]
+        for next_state in get_single_agent_next_states((x, y, fuel, time), agent, maze, fuel_capacity, reservation_table):
+            new_cost = current_cost + move_time[next_state[:2]]
+            new_time = new_cost
+
+            if not goal_distance.reachable(next_state[:2]):
+                continue  # Walled off from the goal
+            next_slot = states.improve(codec.pack(next_state[:2], next_state[2], next_state[3]), slot, new_cost)
+            if next_slot != StateTable.NO_PARENT:
+                priority = new_cost + goal_distance[next_state[:2]]
+                frontier.put(priority, next_slot, new_cost)
 
                 # Update reservation table for the window
                 if new_time < window_size:
@@ -103,19 +104,142 @@ def single_agent_whca(agent, agent_index, maze, fuel_capacity, window_size, rese
                         reservation_table[new_time] = set()
                     reservation_table[new_time].add(next_state[:2])
 
-    return suboptimal_path if suboptimal_path else best_path
+    if budget is not None:
+        budget.finish(SearchBudget.INFEASIBLE)
+    return None
+
+# Safe Interval Path Planning, a drop-in replacement for single_agent_whca.
+# Time is counted in path steps, the way whca_star fills the reservation table. The reserved steps of a cell
+# split its timeline into safe intervals and a state is (cell, safe interval, fuel) with the earliest step the
+# agent can leave it, so waiting for a cell to free up is part of a move instead of one state per waited step.
+# Entering a gas station holds the agent there for the refuel time, as the time of single_agent_whca's states.
+# States are expanded in order of that step, so the first goal state expanded is the earliest arrival. Moves that
+# would trade places with an earlier agent wait for it to go past, and the goal only counts in its last safe
+# interval, where nobody else comes through after the agent stops there.
+def safe_intervals(reserved_steps, parked=float('inf')):
+    # parked is the step from which an agent that is done stands on the cell
+    intervals = []
+    start = 0
+    for step in reserved_steps:
+        if step >= parked:
+            break
+        if step > start:
+            intervals.append((start, step - 1))
+        start = max(start, step + 1)
+    if parked > start:
+        intervals.append((start, parked - 1))
+    return intervals
+
+def enter_steps(node, maze):
+    # Path steps single_agent_sipp spends entering a cell, including the refuel at a gas station
+    return 1 + refuel_time(node, maze) if is_gas_station(node, maze) else 1
+
+def single_agent_sipp(agent, agent_index, maze, fuel_capacity, window_size, reservation_table, budget=None):
+    reserved = {}  # cell -> sorted reserved steps
+    for step in sorted(reservation_table):
+        for cell in reservation_table[step]:
+            if is_move(cell):
+                continue  # Checked against each move with is_move_reserved
+            # The agent is already standing on its start at step 0, whatever the table says
+            if step > 0 or cell != agent.start:
+                reserved.setdefault(cell, []).append(step)
+    intervals = {}
+    def cell_intervals(cell):
+        if cell not in intervals:
+            intervals[cell] = safe_intervals(reserved.get(cell, []), reservation_table.parked.get(cell, float('inf')))
+        return intervals[cell]
+
+    codec = StateCodec(len(maze), len(maze[0]), max(fuel_capacity, agent.fuel))
+    states = StateTable(codec)  # The time field of a packed state holds the safe interval index, the cost the step
+    context = MazeContext.of(maze)
+    goal_steps = DistanceField.field_cache.get(maze, agent.goal, enter_steps)
+    start_slot = states.add(codec.pack(agent.start, agent.fuel, 0), StateTable.NO_PARENT, 0)
+    frontier = BucketQueue()
+    frontier.put(0, start_slot)
+
+    while not frontier.empty():
+        slot = frontier.get()
+        if not states.close(slot):
+            continue  # Stale entry
+        cell, fuel, interval = codec.unpack(states.keys[slot])
+        if budget is not None and not budget.expand():
+            closest = min((closed_slot for closed_slot in range(len(states)) if states.closed[closed_slot]),
+                          key=lambda closed_slot: manhattan_distance(codec.cell(states.keys[closed_slot]), agent.goal))
+            budget.finish(SearchBudget.BUDGET_EXHAUSTED, sipp_path(states, closest, agent, maze))
+            return None
+
+        if cell == agent.goal and cell_intervals(cell)[interval][1] == float('inf'):
+            # Nobody comes through the goal later, the agent can stay there once it is done
+            path = sipp_path(states, slot, agent, maze)
+            if budget is not None:
+                budget.finish(SearchBudget.SOLVED, path)
+            return path
+
+        ready = states.costs[slot]  # First step the agent may leave the cell
+        leave_by = cell_intervals(cell)[interval][1]  # Last step the agent may still stand here
+        for next in context.adjacency[cell]:
+            if not goal_steps.reachable(next):
+                continue
+            new_fuel = fuel_capacity if next in context.stations else fuel - 1
+            if new_fuel < 0:
+                continue
+            stay = enter_steps(next, maze) - 1  # Steps spent refueling after entering
+            for next_interval, (start, end) in enumerate(cell_intervals(next)):
+                if start > leave_by + 1:
+                    break  # Opens after the agent has to be gone
+                entered = max(ready + 1, start)
+                while entered <= leave_by + 1 and is_move_reserved(cell, next, entered - 1, reservation_table):
+                    entered += 1  # Waits for the agent coming the other way to go past
+                next_ready = entered + stay
+                if entered > leave_by + 1 or next_ready > end:
+                    continue  # Has to leave before it gets in or before it is done refueling
+                key = codec.pack(next, new_fuel, next_interval)
+                if states.slot(key) != StateTable.NO_PARENT and states.closed[states.slot(key)]:
+                    continue  # Already expanded at an earlier step
+                next_slot = states.improve(key, slot, next_ready)
+                if next_slot != StateTable.NO_PARENT:
+                    frontier.put(next_ready + goal_steps[next], next_slot, next_ready)
+
+    if budget is not None:
+        budget.finish(SearchBudget.INFEASIBLE)
+    return None
+
+def sipp_path(states, slot, agent, maze):
+    # Back to one (x, y, fuel, step) entry per step, waits and refuels repeat the cell
+    path = []
+    refueling = set()  # Entries of steps spent refueling after entering a gas station
+    chain = []
+    while slot != StateTable.NO_PARENT:
+        chain.append(slot)
+        slot = states.parents[slot]
+    for slot in reversed(chain):
+        (x, y), fuel, _ = states.codec.unpack(states.keys[slot])
+        ready = states.costs[slot]
+        entered = ready - (enter_steps((x, y), maze) - 1 if path else 0)
+        if path:
+            previous = path[-1]
+            for step in range(previous[3] + 1, entered):
+                path.append(previous[:3] + (step,))
+        for step in range(entered, ready + 1):
+            if step > entered:
+                refueling.add(len(path))
+            path.append((x, y, fuel, step))
+    steps = reconstruct_single_path(path, agent, maze)
+    # The 'refuel' step into the station already counts the refuel time, the steps held there don't add to it
+    return [(name, pos, next_pos, 'refueling' if index + 1 in refueling else action)
+            for index, (name, pos, next_pos, action) in enumerate(steps)]
 
 def get_single_agent_next_states(state, agent, maze, fuel_capacity, reservation_table):
     x, y, fuel, time = state
+    context = MazeContext.of(maze)
     next_states = []
 
-    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0), (0, 0)]:  # (0, 0) represents waiting
-        nx, ny = x + dx, y + dy
-        if is_valid_move(nx, ny, maze) and not is_reserved(nx, ny, time + 1, reservation_table):
-            new_fuel = fuel - 1 if (dx, dy) != (0, 0) else fuel  # No fuel consumption when waiting
+    for nx, ny in context.adjacency[(x, y)] + [(x, y)]:  # Staying on (x, y) represents waiting
+        if not is_reserved(nx, ny, time + 1, reservation_table) and not is_move_reserved((x, y), (nx, ny), time, reservation_table):
+            new_fuel = fuel - 1 if (nx, ny) != (x, y) else fuel  # No fuel consumption when waiting
             if new_fuel >= 0:
                 new_time = time + 1
-                if is_gas_station((nx, ny), maze):
+                if (nx, ny) in context.stations:
                     next_states.append((nx, ny, fuel_capacity, new_time + refuel_time((nx, ny), maze)))
                 else:
                     next_states.append((nx, ny, new_fuel, new_time))
@@ -123,17 +247,26 @@ def get_single_agent_next_states(state, agent, maze, fuel_capacity, reservation_
     return next_states
 
 def is_reserved(x, y, time, reservation_table):
-    return time in reservation_table and (x, y) in reservation_table[time]
+    return (time in reservation_table and (x, y) in reservation_table[time]
+            or reservation_table.parked.get((x, y), float('inf')) <= time)
+
+def is_move(entry):
+    # Reservation table entries are cells (x, y) or moves ((x, y), (next_x, next_y))
+    return isinstance(entry[0], tuple)
+
+def is_move_reserved(pos, next_pos, time, reservation_table):
+    # Moving from pos to next_pos at step time while another agent moves the other way swaps them
+    return time in reservation_table and (next_pos, pos) in reservation_table[time]
 
-def reconstruct_single_path(came_from, start, goal, agent, maze):
+def state_path(states, slot):
+    # States from the start to slot, as (x, y, fuel, time) tuples
     path = []
-    current = goal
-    while current != start:
-        path.append(current)
-        current = came_from[current]
-    path.append(start)
-    path.reverse()
+    for key in states.path(slot):
+        (x, y), fuel, time = states.codec.unpack(key)
+        path.append((x, y, fuel, time))
+    return path
 
+def reconstruct_single_path(path, agent, maze):
     processed_path = []
     for i in range(len(path) - 1):
         current_pos = path[i][:2]
@@ -161,6 +294,16 @@ def merge_paths(paths):
                 merged_path.append(path[i])
     return merged_path
 
+def lead_with(path, name):
+    # The merged plan with name's step first in each time step
+    steps_taken = {}
+    order = []
+    for step in path:
+        time_step = steps_taken.get(step[0], 0)
+        steps_taken[step[0]] = time_step + 1
+        order.append((time_step, step[0] != name))
+    return [step for _, step in sorted(zip(order, path), key=lambda pair: pair[0])]
+
 def is_valid_move(x, y, maze):
     return 0 <= x < len(maze) and 0 <= y < len(maze[0]) and maze[x][y] != -1
 
@@ -180,21 +323,34 @@ def refuel_time(node, maze):
     x, y = node
     return abs(maze[x][y]) - 1  # F(a) = abs(a) - 1
 
+def enter_time(node, maze):
+    # Time single_agent_whca charges for stepping into a cell
+    time = 1
+    if is_toll_booth(node, maze):
+        time += toll_booth_wait_time(node, maze)
+    if is_gas_station(node, maze):
+        time += refuel_time(node, maze)
+    return time
+
 def manhattan_distance(pos1, pos2):
     return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
 def calculate_path_time(path, maze):
     total_time = 0
     for step in path:
-        _, current_pos, next_pos, action = step
-        if action == "move" or action == "wait":
-            total_time += 1
-        elif action == "refuel":
-            total_time += refuel_time(next_pos, maze)
-        elif action == "toll":
-            total_time += toll_booth_wait_time(next_pos, maze)
+        total_time += step_time(step, maze)
     return total_time
 
+def step_time(step, maze):
+    _, current_pos, next_pos, action = step
+    if action == "move" or action == "wait":
+        return 1
+    elif action == "refuel":
+        return refuel_time(next_pos, maze)
+    elif action == "toll":
+        return toll_booth_wait_time(next_pos, maze)
+    return 0  # 'refueling' is already counted by the 'refuel' step before it, 'createnewgoal' takes no time
+
 
 def get_agent_stop(path, agents, maze):
     updated_path = []
@@ -219,54 +375,56 @@ def get_agent_stop(path, agents, maze):
         
     return updated_path
 
-def generate_new_subagent_and_recreate_path(path, agents, maze, fuel_capacity):
+def generate_new_subagent_and_recreate_path(path, agents, maze, fuel_capacity, budget=None, low_level=None, rng=None, free_cells=None):
+    # The plan is played a time step at a time, a repeated agent starts the next one (PlanValidator, PathAnimator).
+    # Agents that reached their goal get a new one once the time step is over, so the others still take the moves
+    # the plan counted on, e.g. following someone out of a cell
     result_path = []
     while True:
-        new_path_segment = []
+        new_path_segment = None
+        names = set()  # Agents with a step in the current time step
+        arrived = []  # Indices of the agents that reached their goal in it
+
+        for step in path + [None]:  # None ends the last time step
+            if step is None or step[0] in names:
+                if 0 in arrived:
+                    return result_path  # The main agent is done
+                for index_agent in arrived:
+                    agent = agents[index_agent]
+                    new_position = generate_new_position(maze, rng, free_cells)
+                    result_path.append((agent.name, agent.start, new_position, "createnewgoal"))
+                    if new_position:
+                        agent.goal = new_position
+                        new_path_segment = new_path_segment or agent.name
+                if new_path_segment:
+                    leader = new_path_segment
+                    new_path_segment = whca_star(agents, maze, fuel_capacity, budget=budget, low_level=low_level)
+                    if new_path_segment is None:
+                        return result_path
+                    # The 'createnewgoal' steps take their agents' places in the next time step, the new segment
+                    # starts with one of them so that its first time step is played as a whole
+                    path = lead_with(new_path_segment, leader)
+                    break
+                names.clear()
+                arrived.clear()
+            if step is None:
+                break
 
-        for step in path:
             result_path.append(step)
             agent_name, old_position, current_position, action = step
+            names.add(agent_name)
             if action == "createnewgoal":
                 continue
             # Determine the index of the agent
-            if len(agent_name) > 1:
-                index_agent = int(agent_name[1:])
-                agents[index_agent].start = current_position
-            else:
-                index_agent = 0
-                agents[0].start = current_position
-
-            if agent_name == 'S' and current_position == agents[0].goal:
-                print("Main agent S has reached the goal.")
-                return result_path
-
-            if agent_name != 'S' and current_position == agents[index_agent].goal:
-                print(f"Sub-agent {agent_name} has reached the goal.")
-                new_position = generate_new_position(maze)
-                result_path.append((agent_name, current_position, new_position, "createnewgoal"))
-                print(new_position)
-                if new_position:
-                    agents[index_agent].start = current_position
-                    agents[index_agent].goal = new_position
-
-                    print(f"New goal for {agent_name}: {new_position}")
-                    new_path_segment = whca_star(agents, maze, fuel_capacity)
-                    if new_path_segment is None:
-                        print("No path found for at least one agent.")
-                        return result_path
-                    else:
-                        # Prepare to continue with the new path segment
-                        path = new_path_segment
-                        break
-        
-        # If no new path segment was generated, break the loop
+            index_agent = int(agent_name[1:]) if len(agent_name) > 1 else 0
+            agents[index_agent].start = current_position
+            if current_position == agents[index_agent].goal:
+                arrived.append(index_agent)
+
+        # If no new path segment was generated, the plan has run out
         if not new_path_segment:
             break
 
-        # Continue the outer loop with the new path segment
-        path = new_path_segment
-
     return result_path
 
 # Hàm lấy vị trí hiện tại của các agent 
@@ -283,11 +441,12 @@ def take_current_positions_of_agent(path, num_agents):
             latest_positions[agent_name] = current_pos
     return latest_positions
 
-def generate_new_position(maze):
-    # Tạo danh sách các ô trống không có giá trị -1 
-    empty_squares = [(x, y) for x in range(len(maze)) for y in range(len(maze[0])) if maze[x][y] != -1]
+def generate_new_position(maze, rng=None, free_cells=None):
+    # rng is a random.Random for repeatable goals, free_cells the cells to pick from (every cell that isn't -1
+    # when not given, worked out once per map)
+    empty_squares = free_cells if free_cells is not None else MazeContext.of(maze).free_cells()
     
     if not empty_squares:
         return None
     
-    return random.choice(empty_squares)
\ No newline at end of file
+    return (rng or random).choice(empty_squares)
\ No newline at end of file
@@ -1,25 +1,60 @@
 import Visualizer
 import level3
-import ReadInput
+import MazeContext
+import AsyncPlanner
 
 def level_3(visualizer, file_path):
-    n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+    n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = MazeContext.load(file_path).read_input()
 
     visualizer.root.unbind('<Return')
     visualizer.root.bind("<Return>", lambda *args: level_3(visualizer, file_path))
 
     start = starts[0]  # Starting point 'S'
     goal = goals[0]  # Goal point 'G'
-    path = level3.a_star_fuel(start, goal, time_limit, fuel_capacity, maze)
+
+    # Plan in the background, the window stays responsive and is drawn once the path arrives
+    visualizer.cancel_plans()
+    visualizer.stop_animations()
+    visualizer.canvas.delete('all')
     visualizer.set_map(raw_maze)
     visualizer.make_boxes()
-    
+    lef_padding = visualizer.panel_x()
+    visualizer.canvas.create_text(lef_padding, 12, text='Level 3: fuel limitation', font=('Cascadia Code', 14, 'bold'), anchor='nw')
+    visualizer.canvas.create_text(lef_padding, 40, text='Modified A* with fuel limitation: ' + str(fuel_capacity), font=('Cascadia Code', 14), anchor='nw')
+    status = visualizer.canvas.create_text(lef_padding, 68, text='Planning...', font=('Cascadia Code', 14), anchor='nw')
+
+    planner = AsyncPlanner.get_default_planner()
+    plan_id, _ = planner.fuel_route(start, goal, time_limit, fuel_capacity, maze)
+    visualizer.watch_plan(planner, plan_id,
+                          lambda kind, payload: show_path(visualizer, payload[0] if kind == 'done' else None, maze, fuel_capacity, status),
+                          lambda expansions: visualizer.canvas.itemconfigure(status, text=f'Planning... {expansions} states'))
+
+def draw_frame(visualizer, path, index, fuel_capacity):
+    # One node of the path every 50 ms, scheduled on the Tk loop so the window keeps handling events.
+    # visualizer.stop_animations() (reset_canvas on a level change) cancels the next frame
+    visualizer.frame_id = None
+    lef_padding = visualizer.panel_x()
+    visualizer.canvas.delete('all')
+    visualizer.canvas.create_text(lef_padding, 12, text='Level 3: fuel limitation', font=('Cascadia Code', 14, 'bold'), anchor='nw')
+    visualizer.canvas.create_text(lef_padding, 40, text='Modified A* with fuel limitation: ' + str(fuel_capacity), font=('Cascadia Code', 14), anchor='nw')
+    visualizer.canvas.create_text(lef_padding, 68, text='Success. Total cost: ' + str(len(path) - 1), font=('Cascadia Code', 14), anchor='nw', fill='green')
+    visualizer.canvas.create_text(lef_padding, 100, text='<Enter ⏎> to start the algorithm', font=('Cascadia Code', 14), anchor='nw')
+
+    visualizer.make_boxes()
+    visualizer.update_current(path[index])
+    visualizer.draw_screen()
+    if index + 1 < len(path):
+        visualizer.frame_id = visualizer.root.after(50, draw_frame, visualizer, path, index + 1, fuel_capacity)
+
+def show_path(visualizer, path, maze, fuel_capacity, status):
+    visualizer.canvas.delete(status)
+
     if path:
         print("Path found:", path)
         total_cost = sum(level3.cost_to_move() for i in range(len(path)-1))
         print(f"Total cost: {total_cost}")
-        
-        lef_padding = len(maze[0]) * 50 + 20
+
+        lef_padding = visualizer.panel_x()
         visualizer.canvas.create_text(lef_padding, 12, text='Level 3: fuel limitation', font=('Cascadia Code', 14, 'bold'), anchor='nw')
         visualizer.canvas.create_text(lef_padding, 40, text='Modified A* with fuel limitation: ' + str(fuel_capacity), font=('Cascadia Code', 14), anchor='nw')
         visualizer.canvas.create_text(lef_padding, 68, text='Success. Total cost: ' + str(len(path) - 1), font=('Cascadia Code', 14), anchor='nw', fill='green')
@@ -27,29 +62,17 @@ def level_3(visualizer, file_path):
         visualizer.make_boxes()
         visualizer.draw_screen()
 
-        for node in path:
-            visualizer.canvas.delete('all')
-            visualizer.canvas.create_text(lef_padding, 12, text='Level 3: fuel limitation', font=('Cascadia Code', 14, 'bold'), anchor='nw')
-            visualizer.canvas.create_text(lef_padding, 40, text='Modified A* with fuel limitation: ' + str(fuel_capacity), font=('Cascadia Code', 14), anchor='nw')
-            visualizer.canvas.create_text(lef_padding, 68, text='Success. Total cost: ' + str(len(path) - 1), font=('Cascadia Code', 14), anchor='nw', fill='green')
-            visualizer.canvas.create_text(lef_padding, 100, text='<Enter ⏎> to start the algorithm', font=('Cascadia Code', 14), anchor='nw')
-
-            visualizer.make_boxes()
-            visualizer.update_current(node)
-            visualizer.draw_screen()
-            visualizer.root.after(50)
-            
-        visualizer.root.mainloop()
+        draw_frame(visualizer, path, 0, fuel_capacity)
     else:
-        lef_padding = len(maze[0]) * 50 + 20
+        lef_padding = visualizer.panel_x()
         visualizer.canvas.create_text(lef_padding, 12, text='Level 3: fuel limitation', font=('Cascadia Code', 14, 'bold'), anchor='nw')
         visualizer.canvas.create_text(lef_padding, 40, text='Modified A* with fuel limitation: ' + str(fuel_capacity), font=('Cascadia Code', 14), anchor='nw')
         visualizer.canvas.create_text(lef_padding, 68, text='No path found :<', font=('Cascadia Code', 14), anchor='nw', fill='red')
         visualizer.draw_screen()
 
         print("No path found within the given constraints.")
-        visualizer.root.mainloop()
-        
+
 if __name__ == '__main__':
     visualizer = Visualizer.Visualizer()
-    level_3(visualizer, 'input3_level3.txt')
\ No newline at end of file
+    level_3(visualizer, 'input3_level3.txt')
+    visualizer.root.mainloop()
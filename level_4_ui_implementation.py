@@ -1,11 +1,16 @@
+import copy
+import sys
+
 import Visualizer
 import level4
-import ReadInput
+import MazeContext
+import AsyncPlanner
+import PlanValidator
 
 def level_4(visuals, file_path):
-    n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+    n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = MazeContext.load(file_path).read_input()
 
-    visuals.canvas.delete('all')
+    visuals.reset_canvas()
 
     agents = []
     for i, (start, goal) in enumerate(zip(starts, goals)):
@@ -16,18 +21,23 @@ def level_4(visuals, file_path):
             # Other agents
             agents.append(level4.Agent(start, goal, fuel_capacity, time_limit, name=f"S{i}"))
 
-    # Find the path using WHCA*
-    try:
-        path = level4.whca_star(agents, maze, fuel_capacity)
-        path = level4.get_agent_stop(path, agents, maze)
-        path = level4.generate_new_subagent_and_recreate_path(path, agents, maze, fuel_capacity)
-    except:
-        print("No path found for at least one agent.")
-        path = None
-
     visuals.set_map(raw_maze)
     visuals.make_boxes()
-    
+    lef_padding = visuals.panel_x()
+    status = visuals.canvas.create_text(lef_padding, 12, text='Planning...', font=('Cascadia Code', 14), anchor='nw')
+
+    # Find the path using WHCA* in the background, the window stays responsive meanwhile
+    # The planner moves the agents' starts and goals along, the plan is checked against where they began
+    starting_agents = [copy.copy(agent) for agent in agents]
+    planner = AsyncPlanner.get_default_planner()
+    plan_id, _ = planner.agents(agents, maze, fuel_capacity)
+    visuals.watch_plan(planner, plan_id,
+                       lambda kind, payload: show_paths(visuals, payload[0] if kind == 'done' else None, starting_agents, maze, status),
+                       lambda expansions: visuals.canvas.itemconfigure(status, text=f'Planning... {expansions} states'))
+
+def show_paths(visuals, path, agents, maze, status):
+    visuals.canvas.delete(status)
+
     if path:
         print("Paths found:")
         print(path)
@@ -38,17 +48,32 @@ def level_4(visuals, file_path):
             print(f"  Path: {agent_path}")
             print(f"  Total time: {total_time}")
             print(f"  Within time limit: {'Yes' if total_time <= agent.time_limit else 'No'}")
+        for index, kind, name, message in PlanValidator.validate_plan(path, maze, agents[0].fuel, agents):
+            print(f"Step {index}: {kind} - {message}")
 
         visuals.draw_path_turn_based(path)
     else:
-        lef_padding = len(maze[0]) * 50 + 20
+        lef_padding = visuals.panel_x()
         visuals.canvas.create_text(lef_padding, 12, text='Level 4: Multi agents', font=('Cascadia Code', 14, 'bold'), anchor='nw')
         visuals.canvas.create_text(lef_padding, 40, text='Step', font=('Cascadia Code', 14), anchor='nw')
         visuals.canvas.create_text(lef_padding, 120, text='<Arrow ▶> for next move\n<Space ␣> for autoplay', font=('Cascadia Code', 14), anchor='nw')
 
         visuals.canvas.create_text(lef_padding, 180, text='No path found :<', font=('Cascadia Code', 14), anchor='nw', fill='red')
         print("No path found for at least one agent.")
-        
+
+def replay(visuals, file_path, plan_path):
+    # Play a plan saved with CompactPath.save_plan on its map, nothing is planned
+    raw_maze = MazeContext.load(file_path).raw_maze
+    visuals.reset_canvas()
+    visuals.set_map(raw_maze)
+    visuals.make_boxes()
+    visuals.draw_path_turn_based(plan_path)
+
 if __name__ == '__main__':
+    # python level_4_ui_implementation.py [map file] [saved plan]
     visuals = Visualizer.Visualizer()
-    level_4(visuals, 'input2_level4.txt')
\ No newline at end of file
+    if len(sys.argv) > 2:
+        replay(visuals, sys.argv[1], sys.argv[2])
+    else:
+        level_4(visuals, sys.argv[1] if len(sys.argv) > 1 else 'input2_level4.txt')
+    visuals.root.mainloop()
\ No newline at end of file
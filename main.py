@@ -1,9 +1,8 @@
 import PathFinder
 import Visualizer
-import ReadInput
+import MazeContext
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
 
 import level_3_ui_implementation
 import level_4_ui_implementation
@@ -11,7 +10,7 @@ import level_4_ui_implementation
 index = 0
 
 def level_1(visualizer, file_path):
-    n, m, time_limit, fuel_capacity, maze_grid, maze, starts, goals = ReadInput.read_input_file(file_path)
+    n, m, time_limit, fuel_capacity, maze_grid, maze, starts, goals = MazeContext.load(file_path).read_input()
 
     start = starts[0]  # Starting point 'S'
     goal = goals[0]  # Goal point 'G'
@@ -47,7 +46,7 @@ def level_1(visualizer, file_path):
     bfs_finder.visualizer.make_boxes()
     bfs_finder.visualizer.draw_screen()
     # Instruction
-    lef_padding = len(maze[0]) * 50 + 20
+    lef_padding = visualizer.panel_x()
     visualizer.canvas.create_text(lef_padding, 12, text='Level 1: Basic', font=('Cascadia Code', 14, 'bold'), anchor='nw')
     visualizer.canvas.create_text(lef_padding, 100, text='<Arrow ◀ ▶> to change algorithm\n<Enter ⏎> to start the algorithm', font=('Cascadia Code', 14), anchor='nw')
     
@@ -79,7 +78,7 @@ def level_1(visualizer, file_path):
     # visualizer.root.mainloop()
 
 def level_2(visualizer, file_path):
-    n, m, time_limit, fuel_capacity, maze_grid, maze, starts, goals = ReadInput.read_input_file(file_path)
+    n, m, time_limit, fuel_capacity, maze_grid, maze, starts, goals = MazeContext.load(file_path).read_input()
     
     for ele in visualizer.root.winfo_children():
         if not isinstance(ele, tk.Canvas):
@@ -133,6 +132,12 @@ def level_4(visualizer, file_path):
     button.pack()
     
 
+def show_welcome(visualizer):
+    image = Visualizer.Image.open("images/welcome.png").resize((1100, 680))
+    visualizer.welcome_image = Visualizer.ImageTk.PhotoImage(image)
+    visualizer.canvas.create_image(0, 30, image=visualizer.welcome_image, anchor='nw')
+    
+
 level_list = []
 level_index = 0
 if __name__ == "__main__":
@@ -149,12 +154,12 @@ if __name__ == "__main__":
             level_index = max(min(new_level, len(level_list) - 1), 0)
         print(level_index)
         foo = level_list[level_index]
-        visualizer.canvas.delete('all')
+        visualizer.reset_canvas()
         foo()
         
     visualizer.canvas.create_text(10, 12, text='Using number key 1, 2, 3, 4 to change level', font=('Cascadia Code', 14), anchor='nw')
-    img= ImageTk.PhotoImage(Image.open("images/welcome.png").resize((1100, 680)))
-    visualizer.canvas.create_image(0, 30, image=img, anchor='nw')
+    # The welcome image is loaded once the window is already showing
+    visualizer.root.after_idle(lambda: show_welcome(visualizer))
         
     visualizer.root.bind("<Key-1>", lambda *args: change_level(0))
     visualizer.root.bind("<Key-2>", lambda *args: change_level(1))
@@ -0,0 +1,203 @@
+import random
+import sys
+import tracemalloc
+
+import copy
+import glob
+
+import ReadInput
+import PathFinder
+import SearchBudget
+import level3
+import level4
+import MazeContext
+import PlanValidator
+import DistanceField
+
+# Checks on the solvers that are cheaper to run than to reason about, like import_budget.py.
+# python search_checks.py runs all of them and exits with 1 when one fails.
+
+# Moves and time of the path returned for every bundled input, None when there is no path.
+# Searches on the bucket queue pick among equal-cost paths by its tie-breaking, which is not the order the old
+# heapq frontiers used: lengths and costs are the same as before, the cells can differ, and so can a level 3
+# time, which isn't what a_star_fuel minimises (input3_level3 was 18 with the heap, 20 now).
+EXPECTED_LEVEL1 = {'input1_level1.txt': 12, 'input2_level1.txt': 13, 'input3_level1.txt': 17,
+                   'input4_level1.txt': None, 'input5_level1.txt': 20}
+EXPECTED_LEVEL2 = {'input1_level2.txt': (20, 25), 'input2_level2.txt': (18, 29), 'input3_level2.txt': (9, 11),
+                   'input4_level2.txt': (6, 10), 'input5_level2.txt': None, 'input5_level2a.txt': (17, 34)}
+EXPECTED_LEVEL3 = {'input1_level3.txt': (15, 18), 'input2_level3.txt': (17, 17), 'input2_level3a.txt': (30, 37),
+                   'input3_level3.txt': (14, 20), 'input4_level3.txt': None, 'input4_level3a.txt': (16, 20),
+                   'input4_level3b.txt': (12, 18), 'input5_level3.txt': None}
+
+def check_expected_outputs():
+    failures = []
+    for file_path, expected in EXPECTED_LEVEL1.items():
+        n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+        for finder in ['BFSPathFinder', 'UCSPathFinder', 'AStarPathFinder', 'IDAStarPathFinder']:
+            path = getattr(PathFinder, finder)(maze).find_path(starts[0], goals[0])
+            if (path and len(path)) != expected:
+                failures.append(f'{file_path} {finder}: {path and len(path)} cells, expected {expected}')
+    for file_path, expected in EXPECTED_LEVEL2.items():
+        n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+        finder = PathFinder.PathFinderLevel2(maze)
+        finder.set_time_limit(time_limit)
+        path = finder.find_path(starts[0], goals[0])
+        result = path and (len(path), sum(finder.enter_time(cell, maze) for cell in path[1:]))
+        if result != expected:
+            failures.append(f'{file_path} level 2: {result}, expected {expected}')
+    for file_path, expected in EXPECTED_LEVEL3.items():
+        n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+        path = level3.a_star_fuel(starts[0], goals[0], time_limit, fuel_capacity, maze)
+        result = path and (len(path), sum(level3.enter_time(cell, maze) for cell in path[1:]))
+        if result != expected:
+            failures.append(f'{file_path} level 3: {result}, expected {expected}')
+    return failures
+
+def random_maze(seed, size, walls):
+    rng = random.Random(seed)
+    maze = [[-1 if rng.random() < walls else 0 for _ in range(size)] for _ in range(size)]
+    maze[0][0] = maze[size - 1][size - 1] = 0
+    return maze
+
+def check_anytime_costs():
+    # The cost anytime_paths yields is the number of moves of the path it yields
+    failures = []
+    for seed in range(200):
+        maze = random_maze(seed, 20, 0.3)
+        for path, cost, bound in PathFinder.AStarPathFinder(maze).anytime_paths((0, 0), (19, 19)):
+            if len(path) - 1 != cost:
+                failures.append(f'seed {seed}: {len(path) - 1} moves reported as {cost}')
+    return failures
+
+def check_small_query_memory():
+    # A few steps on an open 20x20 map with time and fuel of 100 has a state space of 4M, a search that only
+    # visits a few hundred states shouldn't allocate for all of them
+    maze = [[0] * 20 for _ in range(20)]
+    level3.a_star_fuel((0, 0), (0, 5), 100, 100, maze)  # Builds the cached distance field
+    tracemalloc.start()
+    path = level3.a_star_fuel((0, 0), (0, 5), 100, 100, maze)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    failures = []
+    if path is None or len(path) != 6:
+        failures.append(f'5 moves expected, got {path}')
+    if peak > 1 << 20:
+        failures.append(f'peak traced memory {peak / 1e6:.1f} MB')
+    return failures
+
+def check_ida_star_memory_cap():
+    # Tables smaller than the set of reachable cells still give shortest paths in a bounded number of
+    # expansions, on maps where the wall hides the goal from the Manhattan heuristic, and unreachable goals
+    # are found out without deepening
+    failures = []
+    for size, cap, max_expansions in [(12, 16, 25000), (12, 32, 2000), (20, 128, 10000)]:
+        maze = [[0] * size for _ in range(size)]
+        maze[size // 2][:size - 1] = [-1] * (size - 1)
+        start, goal = (size // 2 - 1, 0), (size // 2 + 1, 0)
+        reachable = sum(row.count(0) for row in maze)
+        expected = len(PathFinder.AStarPathFinder(maze).find_path(start, goal))
+        finder = PathFinder.IDAStarPathFinder(maze)
+        finder.set_memory_cap(cap)
+        budget = SearchBudget.SearchBudget(max_expansions=max_expansions)
+        finder.set_budget(budget)
+        path = finder.find_path(start, goal)
+        if cap >= reachable or path is None or len(path) != expected:
+            failures.append(f'{size}x{size} with a cap of {cap}: {budget.status}, {path and len(path)} cells, expected {expected}')
+    maze = random_maze(0, 50, 0.35)
+    maze[48][49] = maze[49][48] = -1
+    finder = PathFinder.IDAStarPathFinder(maze)
+    budget = SearchBudget.SearchBudget(max_expansions=1)
+    finder.set_budget(budget)
+    if finder.find_path((0, 0), (49, 49)) is not None or budget.status != SearchBudget.INFEASIBLE:
+        failures.append(f'walled off goal: {budget.status}')
+    return failures
+
+def check_maze_context_edits():
+    # Writes without MazeContext.edited() don't leave a stale context, and edits don't leak into a later load
+    failures = []
+    context = MazeContext.load('input1_level3.txt')
+    cell = next(cell for cell in context.free_cells() if cell not in context.stations)
+    context.maze[cell[0]][cell[1]] = -1
+    if cell not in MazeContext.of(context.maze).walls:
+        failures.append(f'{cell} written without edited() is not a wall in the context')
+    reloaded = MazeContext.load('input1_level3.txt')
+    if reloaded.maze is context.maze or reloaded.maze[cell[0]][cell[1]] == -1:
+        failures.append('load() returned the edited maze')
+    return failures
+
+def check_distance_field_edits():
+    # A cached field isn't handed out for a maze written to without field_cache.edit(), edits through it patch
+    # the field in place
+    failures = []
+    context = MazeContext.load('input1_level3.txt')
+    maze = context.maze
+    goal = context.goals[0]
+    x, y = cell = context.adjacency[goal][0]
+    value = maze[x][y]
+    field = DistanceField.field_cache.get(maze, goal, level3.enter_time)
+    if DistanceField.field_cache.get(maze, goal, level3.enter_time) is not field:
+        failures.append('field of an unchanged maze built again')
+    maze[x][y] = -1
+    if DistanceField.field_cache.get(maze, goal, level3.enter_time) is field:
+        failures.append(f'field handed out again after {cell} was walled off without edit()')
+    field = DistanceField.field_cache.get(maze, goal, level3.enter_time)
+    DistanceField.field_cache.edit(maze, cell, value)
+    if DistanceField.field_cache.get(maze, goal, level3.enter_time) is not field:
+        failures.append(f'field patched by edit() of {cell} built again')
+    elif not field.reachable(cell):
+        failures.append(f'{cell} opened again with edit() is still walled off in the field')
+    return failures
+
+def check_sipp_plans():
+    # SIPP plans of every bundled level 4 map, alone and with new goals handed out, have no agents on the same cell
+    # or trading places. Time limits aren't checked, SIPP minimises steps and not time
+    failures = []
+    for file_path in sorted(glob.glob('input*_level4.txt')):
+        n, m, time_limit, fuel_capacity, raw_maze, maze, starts, goals = ReadInput.read_input_file(file_path)
+        agents = [level4.Agent(start, goal, fuel_capacity, time_limit, is_main=index == 0,
+                               name='S' if index == 0 else f'S{index}')
+                  for index, (start, goal) in enumerate(zip(starts, goals))]
+        starting_agents = [copy.copy(agent) for agent in agents]
+        plan = level4.whca_star(agents, maze, fuel_capacity, low_level=level4.single_agent_sipp)
+        if plan is None:
+            failures.append(f'{file_path}: no plan')
+            continue
+        lifelong = level4.generate_new_subagent_and_recreate_path(plan, agents, maze, fuel_capacity, low_level=level4.single_agent_sipp,
+                                                                  rng=random.Random(0))
+        for name, steps in [('plan', plan), ('lifelong plan', lifelong)]:
+            for index, kind, agent, message in PlanValidator.validate_plan(steps, maze, fuel_capacity, starting_agents):
+                if kind != PlanValidator.TIME:
+                    failures.append(f'{file_path} {name} step {index}: {kind} - {message}')
+    return failures
+
+def check_big_map_small_query():
+    # The context of a new 1000x1000 map, and IDA*'s reachability check, go as far as a 10 move query looks and
+    # not over the whole map
+    failures = []
+    for finder in ['AStarPathFinder', 'IDAStarPathFinder']:
+        maze = [[0] * 1000 for _ in range(1000)]
+        tracemalloc.start()
+        path = getattr(PathFinder, finder)(maze).find_path((500, 500), (505, 505))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if path is None or len(path) != 11:
+            failures.append(f'{finder}: 10 moves expected, got {path}')
+        if peak > 1 << 20:
+            failures.append(f'{finder}: peak traced memory {peak / 1e6:.1f} MB')
+    return failures
+
+CHECKS = [check_expected_outputs, check_anytime_costs, check_small_query_memory, check_ida_star_memory_cap,
+          check_maze_context_edits, check_distance_field_edits, check_sipp_plans, check_big_map_small_query]
+
+def main():
+    ok = True
+    for check in CHECKS:
+        failures = check()
+        print(f'{check.__name__:32s} {"ok" if not failures else "FAILED"}')
+        for failure in failures:
+            print('   ', failure)
+        ok = ok and not failures
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())